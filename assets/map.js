@@ -0,0 +1,91 @@
+// Client-side version of plot_map() in myapp.py, used when CLIENTSIDE_MAP=1.
+// The points are sent once per snapshot (see build_map_points()), the masks
+// and the traces are computed here on every filter change.
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    map: {
+        plot_map: function(high_risk_hospitals, waiting_time_slider, district_filter, start_date, end_date, relayout_data, points) {
+            var layout = {
+                autosize: true,
+                hovermode: 'closest',
+                showlegend: true,
+                mapbox: {
+                    bearing: 0,
+                    center: {lat: 22.302711, lon: 114.177216},
+                    pitch: 0,
+                    zoom: 10,
+                    style: 'carto-positron'
+                },
+                height: 740,
+                margin: {l: 0, r: 0, b: 0, t: 0},
+                legend: {orientation: 'h', title: {text: ''}, x: .02, y: 0.98},
+                uirevision: 'interactive-map'
+            };
+            if (!points) {
+                return {data: [], layout: layout};
+            }
+
+            high_risk_hospitals = high_risk_hospitals || [];
+            district_filter = district_filter || [];
+            start_date = start_date ? start_date.slice(0, 10) : start_date;
+            end_date = end_date ? end_date.slice(0, 10) : end_date;
+
+            function trace(table, mask, selected, color, name) {
+                var res = {lat: [], lon: [], text: []};
+                for (var i = 0; i < mask.length; i++) {
+                    if (mask[i] === selected) {
+                        res.lat.push(table.lat[i]);
+                        res.lon.push(table.lng[i]);
+                        res.text.push(table.text[i]);
+                    }
+                }
+                return {
+                    type: 'scattermapbox',
+                    lat: res.lat,
+                    lon: res.lon,
+                    text: res.text,
+                    mode: 'markers',
+                    marker: {
+                        size: selected ? 10 : 7,
+                        color: color,
+                        opacity: selected ? 0.9 : 0.2,
+                        symbol: 'circle'
+                    },
+                    hoverinfo: 'text',
+                    name: name
+                };
+            }
+
+            var data = [];
+
+            if (high_risk_hospitals.indexOf('show-high-risk') !== -1) {
+                var high_risk = points.high_risk;
+                var districts = {};
+                district_filter.forEach(function(district) { districts[district] = true; });
+                // Dates are 'YYYY-MM-DD' strings, missing dates never exclude a record
+                var high_risk_masks = high_risk.lat.map(function(_, i) {
+                    var start = high_risk.start_date[i];
+                    var end = high_risk.end_date[i];
+                    var is_within_date = !(
+                        (start !== null && end_date && start > end_date) ||
+                        (end !== null && start_date && end < start_date)
+                    );
+                    return is_within_date && districts[high_risk.district[i]] === true;
+                });
+                data.push(trace(high_risk, high_risk_masks, true, 'rgb(255, 0, 0)', 'High Risk Area (selected)'));
+                data.push(trace(high_risk, high_risk_masks, false, 'rgb(255, 0, 0)', 'High Risk Area (not selected)'));
+            }
+
+            if (high_risk_hospitals.indexOf('show-hospitals') !== -1) {
+                var hospitals = points.hospitals;
+                var hospital_masks = hospitals.wait.map(function(wait) {
+                    return wait !== null && wait >= waiting_time_slider[0] && wait <= waiting_time_slider[1];
+                });
+                data.push(trace(hospitals, hospital_masks, true, 'rgb(0, 0, 255)', 'Hospitals (selected)'));
+                data.push(trace(hospitals, hospital_masks, false, 'rgb(0, 0, 255)', 'Hospitals (not selected)'));
+            }
+
+            return {data: data, layout: layout};
+        }
+    }
+});
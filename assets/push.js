@@ -0,0 +1,31 @@
+// Refresh the data-driven components when the server publishes a new snapshot.
+// The server-sent events come from src/push.py; on a new version the hidden
+// snapshot-push button is clicked, which triggers the callbacks listening to
+// its n_clicks. Browsers without EventSource fall back to a click per minute.
+
+(function() {
+    var lastVersion = null;
+
+    function notify() {
+        var button = document.getElementById('snapshot-push');
+        if (button) {
+            button.click();
+        }
+    }
+
+    if (!window.EventSource) {
+        setInterval(notify, 60 * 1000);
+        return;
+    }
+
+    // lastVersion is kept across reconnections, so a snapshot published
+    // while disconnected is noticed on the first event of the new stream
+    var source = new EventSource('/_snapshot-events');
+    source.addEventListener('snapshot', function(event) {
+        var version = JSON.parse(event.data).version;
+        if (lastVersion !== null && version !== lastVersion) {
+            notify();
+        }
+        lastVersion = version;
+    });
+})();
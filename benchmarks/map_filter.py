@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+Compare the full-scan pandas filter of plot_map() with the HighRiskIndex.
+
+data/HIGH_RISK.tsv is repeated --scale times (1x, 10x and 100x by default).
+Each query uses a random date range and a random subset of the districts.
+Both filters must return the same mask.
+
+Usage:
+    python benchmarks/map_filter.py --queries 200 --scale 1 10 100
+"""
+
+import os
+import sys
+import time
+import argparse
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+sys.path.insert(1, os.path.join(dir_path, '..', 'src'))
+import numpy as np
+import pandas as pd
+from wuhan_functions import load_high_risk_csv
+from high_risk_index import HighRiskIndex
+
+
+def scan_mask(high_risk_df, districts, start_date, end_date):
+    is_within_date = ~(
+        (high_risk_df['start_date'] > end_date) |
+        (high_risk_df['end_date'] < start_date)
+    )
+    is_within_district = high_risk_df['sub_district_en'].isin(districts)
+    return (is_within_district & is_within_date).values
+
+
+def random_queries(high_risk_df, n, seed=0):
+    rng = np.random.RandomState(seed)
+    districts = sorted(list(filter(None, high_risk_df['sub_district_en'].dropna().unique())))
+    days = pd.date_range('2020-01-10', '2020-04-30').strftime('%Y-%m-%d')
+    queries = []
+    for _ in range(n):
+        start, end = sorted(rng.choice(days, 2))
+        selected = list(rng.choice(districts, rng.randint(1, len(districts) + 1), replace=False))
+        queries.append((selected, start, end))
+    return queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--scale', type=int, nargs='+', default=[1, 10, 100])
+    args = parser.parse_args()
+
+    base_df = load_high_risk_csv()
+
+    print(f'{"scale":>6}{"rows":>10}{"build (ms)":>12}{"scan (us/q)":>13}{"index (us/q)":>14}{"speed-up":>10}')
+    for scale in args.scale:
+        high_risk_df = pd.concat([base_df] * scale, ignore_index=True)
+        queries = random_queries(high_risk_df, args.queries)
+
+        start = time.perf_counter()
+        index = HighRiskIndex(high_risk_df)
+        build = time.perf_counter() - start
+
+        start = time.perf_counter()
+        scan_masks = [scan_mask(high_risk_df, *query) for query in queries]
+        scan = (time.perf_counter() - start) / len(queries)
+
+        start = time.perf_counter()
+        index_masks = [index.mask(*query) for query in queries]
+        indexed = (time.perf_counter() - start) / len(queries)
+
+        for scan_res, index_res in zip(scan_masks, index_masks):
+            assert (scan_res == index_res).all(), 'The index and the full scan disagree'
+
+        print(f'{scale:>6}{high_risk_df.shape[0]:>10}{build * 1e3:>12.1f}{scan * 1e6:>13.0f}{indexed * 1e6:>14.0f}{scan / indexed:>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""
+Report the in-memory footprint of the cases and high risk tables, before and after the compact schema.
+
+"Before" reads the TSVs the way the loaders used to (every text column as a
+Python str, dates as str for the cases). "After" uses load_cases_csv() and
+load_high_risk_csv(), which apply CASES_SCHEMA / HIGH_RISK_SCHEMA. The lazy
+detail columns the Snapshot splits off are counted in the "after" total, as
+they are held in memory once loaded (marked "lazy" with --columns).
+
+Usage:
+    python benchmarks/memory.py [--columns]
+"""
+
+import os
+import sys
+import argparse
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+sys.path.insert(1, os.path.join(dir_path, '..', 'src'))
+import pandas as pd
+from wuhan_functions import load_cases_csv, load_high_risk_csv, split_case_details, data_dir
+
+
+def load_cases_before():
+    cases_df = pd.read_csv(os.path.join(data_dir, 'CASES.tsv'), dtype=str, sep='\t')
+    cases_df['case_no'] = cases_df['case_no'].astype(int)
+    cases_df['age'] = cases_df['age'].astype(int)
+    return cases_df
+
+
+def load_high_risk_before():
+    high_risk_df = pd.read_csv(
+        os.path.join(data_dir, 'HIGH_RISK.tsv'),
+        dtype={col: str for col in ['action_en', 'action_zh', 'case', 'case_no', 'end_date', 'id', 'location_en',
+                                    'location_zh', 'remarks_en', 'remarks_zh', 'source_url_1', 'source_url_2',
+                                    'start_date', 'sub_district_en', 'sub_district_zh', 'type']},
+        sep='\t'
+    )
+    high_risk_df['end_date'] = pd.to_datetime(high_risk_df['end_date'], format='%Y-%m-%d')
+    high_risk_df['start_date'] = pd.to_datetime(high_risk_df['start_date'], format='%Y-%m-%d')
+    return high_risk_df
+
+
+def report(name, before_df, after_df, details_df=None, columns=False):
+    before = before_df.memory_usage(deep=True, index=False)
+    after = after_df.memory_usage(deep=True, index=False)
+    if details_df is not None:
+        after = pd.concat([after, details_df.memory_usage(deep=True, index=False)])
+    if columns:
+        for col in before.index.union(after.index, sort=False):
+            before_str = f'{str(before_df[col].dtype):>10}{before[col] / 1e3:>10.1f}' if col in before.index else f'{"":>20}'
+            after_dtype = 'lazy' if col not in after_df.columns else str(after_df[col].dtype)
+            after_str = f'{after_dtype:>16}{after[col] / 1e3:>10.1f}' if col in after.index else ''
+            print(f'  {col:<20}{before_str}{after_str}')
+    print(f'{name:<22}{"":>10}{before.sum() / 1e6:>9.2f}M{"":>16}{after.sum() / 1e6:>9.2f}M'
+          f'  ({after.sum() / before.sum():.0%})')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--columns', action='store_true', help='show the footprint of every column (kB)')
+    args = parser.parse_args()
+
+    print(f'{"table / column":<22}{"before":>10}{"":>10}{"after":>16}{"":>10}')
+    cases_df, details_df = split_case_details(load_cases_csv())
+    report('cases', load_cases_before(), cases_df, details_df, args.columns)
+    report('high_risk', load_high_risk_before(), load_high_risk_csv(), columns=args.columns)
+
+
+if __name__ == '__main__':
+    main()
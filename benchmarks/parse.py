@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+Compare json.loads with the fetch path of webscraper on the page-data feeds.
+
+The checked-in data/CASES.tsv and data/HIGH_RISK.tsv are re-encoded in the
+page-data.json layout of wars.vote4.hk (optionally repeated --scale times,
+with new keys for every copy), then turned into a DataFrame:
+
+    json.loads  the whole document parsed at once, as before the streaming parser
+    cold        fetch_cases() / fetch_highrisk() with an empty feed cache
+    one change  the same, after a fetch of the feed with one other node
+
+The fetch functions are called with a session serving the encoded feed, so
+the conditional request, streaming parse and merge are the ones of
+production. Time is the best of --runs, peak memory is measured with
+tracemalloc.
+
+Usage:
+    python benchmarks/parse.py --runs 5 --scale 1 10
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tracemalloc
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+sys.path.insert(1, os.path.join(dir_path, '..', 'src'))
+import pandas as pd
+import webscraper
+from webscraper import fetch_cases, fetch_highrisk, CASES_URL, HIGH_RISK_URL
+
+data_dir = os.path.join(dir_path, '..', 'data')
+
+
+class FeedResponse(object):
+    status_code = 200
+    headers = {}
+
+    def __init__(self, content):
+        self.content = content
+
+    def raise_for_status(self):
+        pass
+
+
+class FeedSession(object):
+    """Serves the same content for every request, as a server ignoring the validators would
+
+    """
+
+    def __init__(self, content):
+        self.content = content
+
+    def get(self, url, headers=None, timeout=None):
+        return FeedResponse(self.content)
+
+
+def encode_feed(path, connection, key, scale=1, case_as_dict=False, changed_key=None):
+    records = pd.read_csv(path, sep='\t', dtype=str, keep_default_na=False).to_dict('records')
+    if case_as_dict:
+        for record in records:
+            record['case'] = {'case_no': record['case']} if record['case'] else None
+    step = max(int(record['case_no']) for record in records) if key == 'case_no' else 0
+
+    edges = []
+    for copy in range(scale):
+        for record in records:
+            node = dict(record)
+            node[key] = str(int(record[key]) + copy * step) if step else f'{record[key]}-{copy}'
+            edges.append({'node': node})
+    if changed_key is not None:
+        edges[-1]['node'] = dict(edges[-1]['node'], **{key: changed_key})
+    return json.dumps({'result': {'data': {connection: {'edges': edges}}}}).encode('utf-8')
+
+
+def parse_json_loads(content, connection):
+    data = json.loads(content)
+    res = []
+    for edge in data['result']['data'][connection]['edges']:
+        res.append(edge['node'])
+    return pd.DataFrame(res)
+
+
+def clear_cache(url, previous_content=None, fetch=None):
+    """Empty the feed cache of url, then fetch previous_content if given
+
+    """
+    webscraper._feed_cache.pop(url, None)
+    if previous_content is not None:
+        fetch(FeedSession(previous_content))
+
+
+def measure(function, *args, runs=3, setup=None):
+    best = float('inf')
+    for _ in range(runs):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        function(*args)
+        best = min(best, time.perf_counter() - start)
+
+    if setup:
+        setup()
+    tracemalloc.start()
+    function(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--scale', type=int, nargs='+', default=[1, 10])
+    args = parser.parse_args()
+
+    if webscraper.ijson is None:
+        print('ijson is not installed, the streaming parser falls back to json.loads')
+
+    feeds = [
+        ('CASES.tsv', 'allWarsCase', 'case_no', fetch_cases, CASES_URL, False),
+        ('HIGH_RISK.tsv', 'allWarsCaseLocation', 'id', fetch_highrisk, HIGH_RISK_URL, True),
+    ]
+
+    print(f'{"feed":<16}{"scale":>6}{"size (MB)":>11}{"parser":>12}{"time (ms)":>11}{"peak (MB)":>11}')
+    for filename, connection, key, fetch, url, case_as_dict in feeds:
+        for scale in args.scale:
+            path = os.path.join(data_dir, filename)
+            content = encode_feed(path, connection, key, scale, case_as_dict)
+            # The same feed with its last node replaced by another one
+            previous_content = encode_feed(path, connection, key, scale, case_as_dict, changed_key='0')
+            session = FeedSession(content)
+            scenarios = [
+                ('json.loads', parse_json_loads, (content, connection), None),
+                ('cold', fetch, (session,), lambda: clear_cache(url)),
+                ('one change', fetch, (session,), lambda: clear_cache(url, previous_content, fetch)),
+            ]
+            for name, function, function_args, setup in scenarios:
+                best, peak = measure(function, *function_args, runs=args.runs, setup=setup)
+                print(f'{filename:<16}{scale:>6}{len(content) / 1e6:>11.2f}{name:>12}{best * 1000:>11.1f}{peak / 1e6:>11.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+Measure the bytes sent per interaction by the map and stats callbacks.
+
+A scripted session (a few map filter changes, each visited --repeats times,
+and snapshot pushes refreshing the stats cards) is replayed through the Flask test
+client of myapp, once per client profile:
+
+    identity    no Accept-Encoding, the uncompressed JSON
+    gzip        Accept-Encoding: gzip
+    gzip+etag   gzip, and the client sends back the ETag it last received
+                for the same request in If-None-Match
+
+The response cache is cleared before every profile, so each one starts cold.
+
+Usage:
+    python benchmarks/payload.py --repeats 3 --pushes 10
+"""
+
+import os
+import sys
+import time
+import argparse
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+sys.path.insert(1, os.path.join(dir_path, '..'))
+import myapp
+
+PROFILES = ['identity', 'gzip', 'gzip+etag']
+
+
+def callback_request(output, inputs):
+    return {
+        'output': output,
+        'inputs': [{'id': id, 'property': prop, 'value': value} for id, prop, value in inputs],
+        'changedPropIds': [],
+        'state': [],
+    }
+
+
+def map_request(show, wait, districts, start_date, end_date):
+    return callback_request('interactive-map.figure', [
+        ('high-risk-hospitals', 'value', show),
+        ('waiting-time-slider', 'value', wait),
+        ('district-filter', 'value', districts),
+        ('date-filter', 'start_date', start_date),
+        ('date-filter', 'end_date', end_date),
+        ('interactive-map', 'relayoutData', None),
+    ])
+
+
+def session(repeats, pushes):
+    layout_options = myapp.get_snapshot().layout_options()
+    districts = layout_options['districts']
+    max_wait = layout_options['max_wait']
+    filters = [
+        (['show-high-risk', 'show-hospitals'], [0, 0], districts, '2020-01-10', '2020-12-31'),
+        (['show-high-risk', 'show-hospitals'], [0, max_wait], districts, '2020-01-10', '2020-12-31'),
+        (['show-high-risk'], [0, 0], districts[:3], '2020-01-10', '2020-12-31'),
+        (['show-high-risk'], [0, 0], districts, '2020-03-01', '2020-03-31'),
+    ]
+    requests = [('map', map_request(*f)) for _ in range(repeats) for f in filters]
+    requests += [
+        ('stats', callback_request('live-update-stats.children', [('snapshot-push', 'n_clicks', n)]))
+        for n in range(pushes)
+    ]
+    return requests
+
+
+def replay(client, requests, profile):
+    etags = {}
+    results = {}
+    for name, body in requests:
+        headers = {}
+        if profile != 'identity':
+            headers['Accept-Encoding'] = 'gzip'
+        key = repr(body)
+        if profile == 'gzip+etag' and key in etags:
+            headers['If-None-Match'] = etags[key]
+
+        start = time.perf_counter()
+        response = client.post('/_dash-update-component', json=body, headers=headers)
+        elapsed = time.perf_counter() - start
+
+        if response.headers.get('ETag'):
+            etags[key] = response.headers['ETag']
+        total_bytes, total_s, count = results.get(name, (0, 0, 0))
+        results[name] = (total_bytes + len(response.get_data()), total_s + elapsed, count + 1)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeats', type=int, default=3, help='number of times each map filter is visited')
+    parser.add_argument('--pushes', type=int, default=10, help='number of snapshot pushes refreshing the stats cards')
+    args = parser.parse_args()
+
+    client = myapp.server.test_client()
+    requests = session(args.repeats, args.pushes)
+
+    print(f'{"profile":<12}{"callback":<10}{"requests":>10}{"bytes / request":>18}{"ms / request":>15}')
+    for profile in PROFILES:
+        myapp.response_cache.clear()
+        for name, (total_bytes, total_s, count) in replay(client, requests, profile).items():
+            print(f'{profile:<12}{name:<10}{count:>10}{total_bytes / count:>18.0f}{total_s / count * 1000:>15.1f}')
+    print(myapp.response_cache.stats())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+Compare loading the data from the TSV files, the pickle files and the Arrow snapshot.
+
+The Arrow snapshot is written from the TSV files to a temporary directory.
+Besides a full load, it is read as the workers do (SERVED_COLUMNS of the
+high risk table), and with the column projection of the map only
+(MAP_COLUMNS). Times are the best of --runs,
+sizes are the bytes on disk.
+
+Usage:
+    python benchmarks/snapshot_formats.py --runs 5
+"""
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+sys.path.insert(1, os.path.join(dir_path, '..', 'src'))
+from snapshot import Snapshot
+from snapshot_store import write_snapshot, read_snapshot, read_table, MAP_COLUMNS
+from wuhan_functions import load_data_csv, load_data_pkl, enrich_data, data_dir
+
+
+def best_of(runs, function):
+    best = float('inf')
+    for _ in range(runs):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def size_of(paths):
+    return sum(os.path.getsize(path) for path in paths)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        write_snapshot(Snapshot(*enrich_data(*load_data_csv()), version=0), tmp_dir)
+        snapshot_dir = os.path.join(tmp_dir, '0')
+
+        scenarios = [
+            ('tsv', lambda: load_data_csv(),
+             [os.path.join(data_dir, name) for name in ['CASES.tsv', 'HIGH_RISK.tsv', 'HOSPITALS.tsv', 'AWAITING.tsv']]),
+            ('pickle', lambda: load_data_pkl(),
+             [os.path.join(data_dir, name) for name in ['CASES.pkl', 'HIGH_RISK.pkl', 'HOSPITALS.pkl', 'AWAITING.pkl']]),
+            ('arrow (full)', lambda: read_snapshot(tmp_dir, columns=None),
+             [os.path.join(snapshot_dir, name) for name in os.listdir(snapshot_dir)]),
+            ('arrow (served)', lambda: read_snapshot(tmp_dir),
+             [os.path.join(snapshot_dir, name) for name in os.listdir(snapshot_dir)]),
+            ('arrow (map columns)', lambda: read_table('high_risk', columns=MAP_COLUMNS, path=tmp_dir).to_pandas(),
+             [os.path.join(snapshot_dir, 'high_risk.arrow')]),
+        ]
+
+        print(f'{"format":<22}{"load (ms)":>11}{"size (kB)":>11}')
+        for name, load, paths in scenarios:
+            print(f'{name:<22}{best_of(args.runs, load) * 1000:>11.1f}{size_of(paths) / 1e3:>11.0f}')
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""
+Measure the time-to-first-request of myapp.py for each start-up mode.
+
+Every run starts a fresh Python process, imports myapp and requests the
+index page and the Dash layout through the Flask test client, which is
+what a freshly booted gunicorn worker has to do before serving a user.
+
+Usage:
+    python benchmarks/startup.py --runs 5 --modes fast blocking
+"""
+
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+root_path = os.path.join(dir_path, '..')
+
+CHILD_CODE = '''
+import json
+import time
+start = time.perf_counter()
+import myapp
+imported = time.perf_counter()
+client = myapp.server.test_client()
+client.get('/')
+client.get('/_dash-layout')
+first_request = time.perf_counter()
+print(json.dumps({
+    'import_s': imported - start,
+    'first_request_s': first_request - start,
+}))
+'''
+
+
+def run_once(mode):
+    env = dict(os.environ, WUHAN_STARTUP=mode)
+    output = subprocess.run(
+        [sys.executable, '-c', CHILD_CODE],
+        cwd=root_path,
+        env=env,
+        stdout=subprocess.PIPE,
+        check=True
+    ).stdout.decode('utf-8')
+    # myapp prints progress messages, the measurement is the last line
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--modes', nargs='+', default=['fast', 'blocking'])
+    args = parser.parse_args()
+
+    print(f'{"mode":<10}{"run":>5}{"import (s)":>14}{"first request (s)":>20}')
+    for mode in args.modes:
+        results = [run_once(mode) for _ in range(args.runs)]
+        for i, res in enumerate(results):
+            print(f'{mode:<10}{i:>5}{res["import_s"]:>14.3f}{res["first_request_s"]:>20.3f}')
+        best = min(res['first_request_s'] for res in results)
+        print(f'{mode:<10}{"best":>5}{"":>14}{best:>20.3f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,301 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark the data loaders and the hot callbacks, at the size of the checked-in data and scaled up.
+
+Everything runs offline: myapp is imported with WUHAN_STARTUP=offline, and
+the data is data/*.tsv, or the same rows repeated --scales times (new case
+numbers, new high risk venues with jittered coordinates) written to a
+temporary directory. For every scale and scenario the report gives the
+latency percentiles over --runs runs, the peak memory allocated during one
+run (tracemalloc) and the size of the JSON sent to the browser.
+
+Scenarios:
+    load/csv          the TSV loaders, as in load_data_csv()
+    load/snapshot     read_snapshot() of an Arrow snapshot of the same data
+    load/pkl          load_data_pkl() (scale 1 only, it reads data/*.pkl)
+    load/sql, live    load_data_sql(), load_data_live() (scale 1, with --online)
+    map/cold          the map callback with an empty figure cache
+    map/warm          the map callback with the figure in the cache
+    case/cold         the case card callback with an empty card cache
+    stats             the stats cards callback
+
+The results are written as JSON to --output. With --compare, the median
+latencies are compared with a previous result file, and the exit status is
+1 if any scenario is slower by more than --tolerance.
+
+Usage:
+    python benchmarks/suite.py --scales 1 10 100 --runs 20
+    python benchmarks/suite.py --compare benchmarks/results/baseline.json
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import shutil
+import random
+import platform
+import argparse
+import tempfile
+import datetime
+import tracemalloc
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+sys.path.insert(1, os.path.join(dir_path, '..'))
+os.environ['WUHAN_STARTUP'] = 'offline'
+os.environ['CLIENTSIDE_MAP'] = '0'
+import numpy as np
+import pandas as pd
+import plotly
+import myapp
+from snapshot import Snapshot, publish_snapshot
+from wuhan_functions import (
+    load_cases_csv, load_high_risk_csv, load_hospital_awaiting_csv,
+    enrich_data, load_data_pkl, load_data_sql, load_data_live, data_dir
+)
+
+results_dir = os.path.join(dir_path, 'results')
+
+MAP_FILTERS = [
+    (['show-high-risk', 'show-hospitals'], [0, 0], None, '2020-01-10', '2020-12-31'),
+    (['show-high-risk'], [0, 0], None, '2020-03-01', '2020-03-31'),
+    (['show-high-risk', 'show-hospitals'], [0, 3], 3, '2020-01-10', '2020-12-31'),
+]
+
+#######################################
+### Synthetic data
+#######################################
+
+def write_scaled_data(directory, scale, seed=0):
+    """Write CASES.tsv and HIGH_RISK.tsv with the rows of data/ repeated scale times
+
+    """
+    cases_df = pd.read_csv(os.path.join(data_dir, 'CASES.tsv'), dtype=str, sep='\t')
+    high_risk_df = pd.read_csv(os.path.join(data_dir, 'HIGH_RISK.tsv'), dtype=str, sep='\t')
+    case_step = int(cases_df['case_no'].astype(int).max())
+    rng = np.random.RandomState(seed)
+
+    cases_copies = []
+    high_risk_copies = []
+    for copy in range(scale):
+        cases_copy = cases_df.copy()
+        cases_copy['case_no'] = (cases_df['case_no'].astype(int) + copy * case_step).astype(str)
+        cases_copies.append(cases_copy)
+
+        high_risk_copy = high_risk_df.copy()
+        if copy:
+            # Every copy is a new set of venues, about a kilometer away from the original ones
+            high_risk_copy['id'] = high_risk_df['id'] + f'-{copy}'
+            high_risk_copy['location_en'] = high_risk_df['location_en'] + f' ({copy})'
+            for col in ['lat', 'lng']:
+                coordinates = pd.to_numeric(high_risk_df[col], errors='coerce')
+                high_risk_copy[col] = (coordinates + rng.uniform(-0.01, 0.01, len(coordinates))).astype(str)
+            case_nos = pd.to_numeric(high_risk_df['case_no'], errors='coerce') + copy * case_step
+            high_risk_copy['case_no'] = case_nos.astype('Int64').astype(str).replace('<NA>', np.nan)
+        high_risk_copies.append(high_risk_copy)
+
+    # Some remarks contain line breaks, quoting every field keeps them readable by the C parser
+    pd.concat(cases_copies).to_csv(os.path.join(directory, 'CASES.tsv'), sep='\t', index=False, quoting=csv.QUOTE_ALL)
+    pd.concat(high_risk_copies).to_csv(os.path.join(directory, 'HIGH_RISK.tsv'), sep='\t', index=False, quoting=csv.QUOTE_ALL)
+
+
+def load_scaled_data(directory):
+    cases_df = load_cases_csv(os.path.join(directory, 'CASES.tsv'))
+    high_risk_df = load_high_risk_csv(os.path.join(directory, 'HIGH_RISK.tsv'))
+    hospital_awaiting_df = load_hospital_awaiting_csv()
+    return cases_df, high_risk_df, None, hospital_awaiting_df
+
+#######################################
+### Measurements
+#######################################
+
+def payload_bytes(output):
+    """Size of the JSON sent for a callback output (Dash callbacks return their serialized response)
+
+    """
+    if output is None:
+        return None
+    if isinstance(output, str):
+        return len(output.encode('utf-8'))
+    return len(json.dumps(output, cls=plotly.utils.PlotlyJSONEncoder).encode('utf-8'))
+
+
+def measure(function, runs, setup=None, payload=True):
+    latencies = []
+    output = None
+    for _ in range(runs):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        output = function()
+        latencies.append(time.perf_counter() - start)
+
+    if setup:
+        setup()
+    tracemalloc.start()
+    function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    latencies = np.array(latencies) * 1000
+    return {
+        'runs': runs,
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p90_ms': float(np.percentile(latencies, 90)),
+        'p99_ms': float(np.percentile(latencies, 99)),
+        'max_ms': float(latencies.max()),
+        'peak_memory_kb': peak / 1e3,
+        'payload_bytes': payload_bytes(output) if payload else None,
+    }
+
+
+def callback(output):
+    """The function Dash calls for output, which returns the serialized response
+
+    """
+    return myapp.app.callback_map[output]['callback']
+
+#######################################
+### Scenarios
+#######################################
+
+def loader_scenarios(scale, directory, online):
+    scenarios = [('load/csv', lambda: load_scaled_data(directory))]
+
+    # Without pyarrow (or with a broken store) the scenario is skipped, the others still run
+    try:
+        from snapshot_store import write_snapshot, read_snapshot
+        snapshot_dir = os.path.join(directory, 'snapshot')
+        write_snapshot(Snapshot(*enrich_data(*load_scaled_data(directory)), version=scale), snapshot_dir)
+        scenarios.append(('load/snapshot', lambda: read_snapshot(snapshot_dir).as_tuple()))
+    except Exception as e:
+        print(f'Skipping {scale}x/load/snapshot: {e!r}')
+
+    if scale == 1:
+        if os.path.exists(os.path.join(data_dir, 'CASES.pkl')):
+            scenarios.append(('load/pkl', load_data_pkl))
+        if online:
+            scenarios.append(('load/sql', load_data_sql))
+            scenarios.append(('load/live', load_data_live))
+    return scenarios
+
+
+def callback_scenarios(snapshot):
+    districts = snapshot.districts().districts
+    case_nos = snapshot.cases_df['case_no'].tolist()
+    rng = random.Random(0)
+
+    def map_inputs():
+        show, wait, n_districts, start_date, end_date = MAP_FILTERS[rng.randrange(len(MAP_FILTERS))]
+        return show, wait, districts[:n_districts] if n_districts else districts, start_date, end_date, None
+
+    plot_map = callback('interactive-map.figure')
+    update_case_description = callback('case-description.children')
+    update_stats_cards = callback('live-update-stats.children')
+    warm_inputs = map_inputs()
+
+    return [
+        ('map/cold', lambda: plot_map(*map_inputs()), myapp.figure_cache.clear),
+        ('map/warm', lambda: plot_map(*warm_inputs), None),
+        ('case/cold', lambda: update_case_description(rng.choice(case_nos)), myapp.case_card_cache.clear),
+        ('stats', lambda: update_stats_cards(0), None),
+    ]
+
+
+def run(scales, runs, online):
+    results = {}
+    for scale in scales:
+        directory = tempfile.mkdtemp()
+        try:
+            write_scaled_data(directory, scale)
+
+            for name, function in loader_scenarios(scale, directory, online):
+                try:
+                    results[f'{scale}x/{name}'] = measure(function, runs, payload=False)
+                except Exception as e:
+                    print(f'{scale}x/{name} failed: {e}')
+
+            try:
+                snapshot = Snapshot(*enrich_data(*load_scaled_data(directory)), version=scale)
+                publish_snapshot(snapshot)
+                scenarios = callback_scenarios(snapshot)
+            except Exception as e:
+                print(f'Skipping the {scale}x callbacks: {e!r}')
+                scenarios = []
+            for name, function, setup in scenarios:
+                try:
+                    results[f'{scale}x/{name}'] = measure(function, runs, setup=setup)
+                except Exception as e:
+                    print(f'{scale}x/{name} failed: {e}')
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+    return results
+
+#######################################
+### Report
+#######################################
+
+def print_results(results, baseline=None, tolerance=0.2):
+    """Print the results, with the ratio to the baseline median. Return the scenarios slower than tolerance
+
+    """
+    regressions = []
+    print(f'{"scenario":<22}{"p50 (ms)":>10}{"p90 (ms)":>10}{"p99 (ms)":>10}{"peak (kB)":>12}'
+          f'{"payload (B)":>13}{"vs baseline":>13}')
+    for name, res in results.items():
+        payload = f'{res["payload_bytes"]:>13}' if res['payload_bytes'] is not None else f'{"":>13}'
+        comparison = ''
+        if baseline and name in baseline:
+            ratio = res['p50_ms'] / baseline[name]['p50_ms'] if baseline[name]['p50_ms'] else float('inf')
+            comparison = f'{ratio:.2f}x'
+            if ratio > 1 + tolerance:
+                comparison += ' !'
+                regressions.append(name)
+        print(f'{name:<22}{res["p50_ms"]:>10.2f}{res["p90_ms"]:>10.2f}{res["p99_ms"]:>10.2f}'
+              f'{res["peak_memory_kb"]:>12.0f}{payload}{comparison:>13}')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--online', action='store_true', help='also benchmark load_data_sql and load_data_live')
+    parser.add_argument('--output', default=os.path.join(
+        results_dir, datetime.datetime.now().strftime('%Y%m%d-%H%M%S') + '.json'
+    ))
+    parser.add_argument('--compare', help='result file to compare the median latencies with')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='slowdown reported as a regression')
+    args = parser.parse_args()
+
+    results = run(args.scales, args.runs, args.online)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+    regressions = print_results(results, baseline, args.tolerance)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump({
+            'meta': {
+                'created_at': datetime.datetime.now().isoformat(),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'pandas': pd.__version__,
+                'scales': args.scales,
+                'runs': args.runs,
+            },
+            'results': results,
+        }, f, indent=2)
+    print(f'Results written to {args.output}')
+
+    if regressions:
+        print(f'Slower than the baseline by more than {args.tolerance:.0%}: {", ".join(regressions)}')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -12,12 +12,23 @@ import dash
 import dash_core_components as dcc
 import dash_html_components as html
 import dash_bootstrap_components as dbc
-from dash.dependencies import Input, Output
+from dash.dependencies import Input, Output, State, ClientsideFunction
+from dash.exceptions import PreventUpdate
 import plotly.graph_objects as go
 import datetime
 import pytz
-from wuhan_functions import load_data, calculate_stats
-from webscraper import fetch_cases
+import numpy as np
+from snapshot import get_snapshot, publish_snapshot
+from refresher import start_refresher, load_local_snapshot
+from figure_cache import FigureCache
+from response_cache import ResponseCache
+import push
+from high_risk_index import build_high_risk_index
+from epicurve import build_epidemic_curve, DIMENSIONS
+from case_index import build_case_index
+from case_search import build_case_search_index
+from venues import build_high_risk_venues
+from spatial_index import build_grid_index, zoom_level, viewport_key
 tz = pytz.timezone('Asia/Hong_Kong')
 
 #######################################
@@ -26,7 +37,8 @@ tz = pytz.timezone('Asia/Hong_Kong')
 
 external_stylesheets = [dbc.themes.BOOTSTRAP]
 
-app = dash.Dash(__name__, external_stylesheets=external_stylesheets)
+# Gzip the responses with Flask-Compress
+app = dash.Dash(__name__, external_stylesheets=external_stylesheets, compress=True)
 
 server = app.server
 
@@ -34,7 +46,44 @@ server = app.server
 ### load data
 #######################################
 
-cases_df, high_risk_df, stats_df, hospital_awaiting_df = load_data(live=True)
+# In 'fast' start-up mode the layout is served at once from the last local snapshot
+# and fresh data is swapped in by the background refresher. 'blocking' waits for it.
+# 'offline' serves the local snapshot only, without the refresher (benchmarks, no network).
+STARTUP_MODE = os.environ.get('WUHAN_STARTUP', 'fast')
+
+if STARTUP_MODE == 'offline':
+    publish_snapshot(load_local_snapshot())
+else:
+    start_refresher(blocking=(STARTUP_MODE == 'blocking'))
+
+# With CLIENTSIDE_MAP=1 the map points are sent to the browser once per snapshot
+# and filtered there, instead of a server round-trip per interaction
+CLIENTSIDE_MAP = os.environ.get('CLIENTSIDE_MAP', '0') == '1'
+
+# Map figures keyed by snapshot version and filter state, see plot_map()
+figure_cache = FigureCache(maxsize=int(os.environ.get('FIGURE_CACHE_SIZE', 256)))
+
+# Rendered case cards keyed by snapshot version and case number, see update_case_description()
+case_card_cache = FigureCache(maxsize=int(os.environ.get('CASE_CARD_CACHE_SIZE', 512)))
+
+# Serialized and gzipped callback responses keyed by snapshot version and inputs, with strong ETags.
+# Only outputs depending on nothing but the snapshot and their inputs are listed. Every input is part
+# of the key, except the ids listed for the output (the push button only triggers a refresh).
+response_cache = ResponseCache(
+    lambda: get_snapshot().version,
+    outputs={
+        'interactive-map.figure': [],
+        'case-description.children': [],
+        'case-drop-down.options': [],
+        'live-update-stats.children': ['snapshot-push'],
+        'epidemic-curve.figure': ['snapshot-push'],
+    },
+    maxsize=int(os.environ.get('RESPONSE_CACHE_SIZE', 256))
+)
+response_cache.init_app(server)
+
+# Server-sent events announcing new snapshots, see assets/push.js
+push.init_app(server)
 
 ### The function update_stats_cards() is relocated from here
 
@@ -46,114 +95,164 @@ cases_df, high_risk_df, stats_df, hospital_awaiting_df = load_data(live=True)
 ### We define the appearance of the dashboard, using syntax like HTML
 #######################################
 
-app.layout = html.Div(children=[
-    dbc.Row([
-        dbc.Col(
-            [
-                html.Img(src=app.get_asset_url(r'fti_logo.png'), id='fti_logo', style={"height": '60px'})
-            ],
-            width=3
-        ),
-        dbc.Col(
-            [
-                html.H1('COVID-19 Hong Kong Dashboard', style={'text-align': 'center'}),
-            ],
-            width=6
-        ),
-        dbc.Col(
-            id='live-update-time',   ### Challenging Exercise
-            width=3
-        )
-    ]),
-    dbc.Row(id='live-update-stats'),   ### We changed here from calling the function to using the id.
-    dbc.Row([
-        dbc.Col(
-            [
-                dcc.Graph(
-                    id='interactive-map'   ### We removed the plot_map() function from here
-                ),
-                html.Div(
-                    [
-                        html.H4('New Cases'),
-                        dcc.Dropdown(
-                            id='case-drop-down',
-                            options=[
-                                {
-                                    'label': f'#{row.case_no}: Age {row.age} {row.gender}, {row.type_en} {row.status}', 
-                                    'value': row.case_no
-                                } for idx, row in cases_df.sort_values(by='case_no', ascending=False).iterrows()
-                            ],
-                            value=cases_df['case_no'].max()
-                        ),
-                        html.Div(
-                            id='case-description'
-                        )
+def build_layout_fragments(layout_options, district_options, end_date):
+    '''
+    Return the components of the layout depending on the data: the case picker and the map filters
+    '''
+    case_picker = dcc.Dropdown(
+        id='case-drop-down',
+        # Filled with a page of matches per keystroke by update_case_options()
+        options=[],
+        placeholder='Search by case number, age, gender, type or status',
+        value=layout_options['case_value']
+    )
+
+    map_filters = html.Div(
+        [
+            dcc.Checklist(
+                id='high-risk-hospitals',
+                options=[
+                    {'label': 'High Risk Area   ', 'value': 'show-high-risk'},
+                    {'label': 'Hospitals   ', 'value': 'show-hospitals'}
+                ],
+                value=['show-high-risk', 'show-hospitals'],
+                labelStyle={'display': 'inline-block'}
+            ),
+            html.P('Filter hospitals by A&E waiting time: '),
+            dcc.RangeSlider(
+                id='waiting-time-slider',
+                marks={i: f'> {i} hr' for i in range(0, layout_options['max_wait'] + 1)},
+                min=0,
+                max=layout_options['max_wait'],
+                value=[0, 0]
+            ),
+            html.P('Filter high risk areas by dates: '),
+            dcc.DatePickerRange(
+                id='date-filter',
+                start_date=datetime.datetime(2020, 1, 10),
+                end_date=end_date
+            ),
+            html.P('Filter by districts: '),
+            dcc.RadioItems(
+                id='district-radio-items',
+                options=[
+                    {'label': 'Clear All', 'value': 'clear-all'},
+                    {'label': 'Show All', 'value': 'show-all'}
+                ],
+                value='show-all',
+                labelStyle={'display': 'inline-block'}
+            ),
+            dcc.Dropdown(
+                id='district-filter',
+                options=district_options,
+                multi=True,
+                value=layout_options['districts']
+            )
+        ],
+        className='pretty_container four columns'
+    )
+    return case_picker, map_filters
+
+def build_layout(case_picker, map_filters):
+    '''
+    Return the layout around the data-dependent fragments
+    '''
+    return html.Div(children=[
+        dbc.Row([
+            dbc.Col(
+                [
+                    html.Img(src=app.get_asset_url(r'fti_logo.png'), id='fti_logo', style={"height": '60px'})
+                ],
+                width=3
+            ),
+            dbc.Col(
+                [
+                    html.H1('COVID-19 Hong Kong Dashboard', style={'text-align': 'center'}),
+                ],
+                width=6
+            ),
+            dbc.Col(
+                id='live-update-time',   ### Challenging Exercise
+                width=3
+            )
+        ]),
+        dbc.Row(id='live-update-stats'),   ### We changed here from calling the function to using the id.
+        dbc.Row([
+            dbc.Col(
+                [
+                    dcc.Graph(
+                        id='interactive-map'   ### We removed the plot_map() function from here
+                    ),
+                    html.Div(
+                        [
+                            html.H4('New Cases'),
+                            case_picker,
+                            html.Div(
+                                id='case-description'
+                            )
                         
-                    ],
-                    className='mini_container'
-                )
-            ],
-            width=8
-        ),
-        dbc.Col(
-            [
-                html.Div(
-                    [
-                        dcc.Checklist(
-                            id='high-risk-hospitals',
-                            options=[
-                                {'label': 'High Risk Area   ', 'value': 'show-high-risk'},
-                                {'label': 'Hospitals   ', 'value': 'show-hospitals'}
-                            ],
-                            value=['show-high-risk', 'show-hospitals'],
-                            labelStyle={'display': 'inline-block'}
-                        ),
-                        html.P('Filter hospitals by A&E waiting time: '),
-                        dcc.RangeSlider(
-                            id='waiting-time-slider',
-                            marks={i: f'> {i} hr' for i in range(0, hospital_awaiting_df['topWait_value'].max() + 1)},
-                            min=0,
-                            max=hospital_awaiting_df['topWait_value'].max(),
-                            value=[0, 0]
-                        ),
-                        html.P('Filter high risk areas by dates: '),
-                        dcc.DatePickerRange(
-                            id='date-filter',
-                            start_date=datetime.datetime(2020, 1, 10),
-                            end_date=datetime.datetime.today()
-                        ),
-                        html.P('Filter by districts: '),
-                        dcc.RadioItems(
-                            id='district-radio-items',
-                            options=[
-                                {'label': 'Clear All', 'value': 'clear-all'},
-                                {'label': 'Show All', 'value': 'show-all'}
-                            ],
-                            value='show-all',
-                            labelStyle={'display': 'inline-block'}
-                        ),
-                        dcc.Dropdown(
-                            id='district-filter',
-                            options=[
-                                {'label': district, 'value': district} for district in sorted(list(filter(None, high_risk_df['sub_district_en'].unique())))
-                            ],
-                            multi=True,
-                            value=sorted(list(filter(None, high_risk_df['sub_district_en'].unique())))
-                        )
-                    ],
-                    className='pretty_container four columns'
-                )
-            ],
-            width=4
-        )
-    ]),
-    html.Footer('This website and its contents herein, including all data, mapping, and analysis (“Website”), is provided for educational purpose internally within FTI Consulting, Inc. (FTI).  The Website relies upon publicly available data from multiple sources, that do not always agree. FTI hereby disclaims any and all representations and warranties with respect to the Website, including accuracy, fitness for use, and merchantability.  Reliance on the Website for medical guidance or use of the Website in commerce is strictly prohibited.'),
-    dcc.Interval(
-        id='interval-component',
-        interval=60*1000, # in millisecondsS
-        n_intervals=0
-    )   ### We updated the interval component here
-])
+                        ],
+                        className='mini_container'
+                    )
+                ],
+                width=8
+            ),
+            dbc.Col(
+                [
+                    map_filters
+                ],
+                width=4
+            )
+        ]),
+        dbc.Row([
+            dbc.Col(
+                [
+                    html.Div(
+                        [
+                            html.H4('Daily Cases'),
+                            dcc.RadioItems(
+                                id='epidemic-curve-split',
+                                options=[
+                                    {'label': 'By classification   ', 'value': 'classification'},
+                                    {'label': 'By status   ', 'value': 'status'}
+                                ],
+                                value='classification',
+                                labelStyle={'display': 'inline-block'}
+                            ),
+                            dcc.Graph(
+                                id='epidemic-curve'
+                            )
+                        ],
+                        className='mini_container'
+                    )
+                ]
+            )
+        ]),
+        html.Footer('This website and its contents herein, including all data, mapping, and analysis (“Website”), is provided for educational purpose internally within FTI Consulting, Inc. (FTI).  The Website relies upon publicly available data from multiple sources, that do not always agree. FTI hereby disclaims any and all representations and warranties with respect to the Website, including accuracy, fitness for use, and merchantability.  Reliance on the Website for medical guidance or use of the Website in commerce is strictly prohibited.'),
+        dcc.Store(id='map-points'),
+        dcc.Store(id='map-points-version'),
+        # Clicked by assets/push.js when a new snapshot is published, instead of polling every minute
+        html.Button(id='snapshot-push', n_clicks=0, style={'display': 'none'})
+    ])
+
+def serve_layout():
+    '''
+    Return the layout of the current snapshot, so new data is shown without restarting the workers.
+    Dash calls this on every page load.
+    The inputs of every step are fetched first, so no derived() build runs inside another.
+    The date filter ends today, so the layout is built once per snapshot version and day.
+    '''
+    snapshot = get_snapshot()
+    end_date = datetime.date.today().isoformat()
+    layout_options = snapshot.layout_options()
+    district_options = snapshot.districts().options()
+    fragments = snapshot.derived(
+        f'layout_fragments_{end_date}',
+        lambda snapshot: build_layout_fragments(layout_options, district_options, end_date)
+    )
+    return snapshot.derived(f'layout_{end_date}', lambda snapshot: build_layout(*fragments))
+
+app.layout = serve_layout
 
 @app.callback(
 	Output('district-filter', 'value'),
@@ -164,12 +263,24 @@ def update_district_list(mode):
 
 	'''
 	if mode == 'show-all':
-		value = sorted(list(filter(None, high_risk_df['sub_district_en'].unique())))
+		value = get_snapshot().districts().districts
 	else:
 		value = []
 	return value
 
 
+@app.callback(
+    Output('case-drop-down', 'options'),
+    [Input('case-drop-down', 'search_value')],
+    [State('case-drop-down', 'value')]
+)
+def update_case_options(search_value, case_no):
+    '''
+    Return the cases matching the text typed in the case picker, one bounded page at a time
+    '''
+    case_search_index = get_snapshot().derived('case_search_index', build_case_search_index)
+    return case_search_index.options(search_value, selected=case_no)
+
 ### Adding the callback here to link the input (Dropdown list with id='case-drop-down') with output (with id='case-description')
 @app.callback(
     Output(component_id='case-description', component_property='children'),
@@ -177,9 +288,20 @@ def update_district_list(mode):
 )
 def update_case_description(case_no):
     '''
-    Return the content inside the 'New Case' card
+    Return the content inside the 'New Case' card, from the card cache if it was rendered for this snapshot
     '''
-    selected_case = cases_df[cases_df['case_no'] == case_no].iloc[0].to_dict()
+    snapshot = get_snapshot()
+    case_index = snapshot.derived('case_index', build_case_index)
+    if case_no not in case_index:
+        raise PreventUpdate
+    return case_card_cache.get_or_build(
+        (snapshot.version, case_no),
+        lambda: build_case_card(snapshot, case_index.get(case_no))
+    )
+
+def build_case_card(snapshot, selected_case):
+    # The detail text is not kept in cases_df, it is loaded on demand
+    selected_case.update(snapshot.case_details(selected_case["case_no"]))
     output = [
         html.Hr(),
         html.P(f'#{selected_case["case_no"]} ({selected_case["status"]})'),
@@ -208,17 +330,81 @@ def update_case_description(case_no):
 ### We create the map by using plotly scattermapbox here
 #######################################
 
-@app.callback(
-    Output('interactive-map', 'figure'),
-    [
-        Input('high-risk-hospitals', 'value'),
-        Input('waiting-time-slider', 'value'),
-        Input('district-filter', 'value'),
-        Input('date-filter', 'start_date'),
-        Input('date-filter', 'end_date')
+map_filter_inputs = [
+    Input('high-risk-hospitals', 'value'),
+    Input('waiting-time-slider', 'value'),
+    Input('district-filter', 'value'),
+    Input('date-filter', 'start_date'),
+    Input('date-filter', 'end_date'),
+    Input('interactive-map', 'relayoutData')
+]
+
+MAP_ZOOM = 10
+MAP_CENTER = {'lat': 22.302711, 'lon': 114.177216}
+
+def plot_map(high_risk_hospitals, waiting_time_slider, district_filter, start_date, end_date, relayout_data=None):
+    '''
+    Return the map figure, from the figure cache if the same filters were used on the same snapshot
+    '''
+    snapshot = get_snapshot()
+
+    # The high risk markers are clustered for the zoom level, and restricted to
+    # the visible area when zoomed in, so the figure size does not grow with the data
+    zoom, center = MAP_ZOOM, None
+    if relayout_data:
+        zoom = relayout_data.get('mapbox.zoom', zoom)
+        center = relayout_data.get('mapbox.center')
+    level = zoom_level(zoom)
+    viewport = viewport_key(level, center)
+
+    # Normalize the filter state, so that equivalent filters share the same cache entry.
+    # The data has a daily granularity, only the date part of the date filter matters.
+    high_risk_hospitals = tuple(sorted(high_risk_hospitals or []))
+    waiting_time_slider = tuple(waiting_time_slider)
+    district_filter = tuple(sorted(district_filter or []))
+    start_date = start_date[:10] if start_date else start_date
+    end_date = end_date[:10] if end_date else end_date
+
+    key = (snapshot.version, high_risk_hospitals, waiting_time_slider, district_filter, start_date, end_date, level, viewport)
+    return figure_cache.get_or_build(
+        key,
+        lambda: build_map_figure(snapshot, high_risk_hospitals, waiting_time_slider, district_filter, start_date, end_date, level, viewport)
+    )
+
+def high_risk_cluster_trace(snapshot, mask, level, viewport, selected):
+    '''
+    Return the Scattermapbox trace of the clusters of the high risk venues selected by mask
+    '''
+    grid_index = snapshot.derived('grid_index', build_grid_index)
+    lat, lng, count, single = grid_index.clusters(mask, level, viewport)
+
+    hover_text = snapshot.derived('high_risk_venues', build_high_risk_venues).venues_df['hover_text'].values
+    text = [
+        hover_text[position] if position >= 0 else f'{n} high risk locations'
+        for position, n in zip(single, count)
     ]
-)
-def plot_map(high_risk_hospitals, waiting_time_slider, district_filter, start_date, end_date):
+
+    return go.Scattermapbox(
+        lat=lat,
+        lon=lng,
+        mode='markers',
+        marker=go.scattermapbox.Marker(
+            size=(10 if selected else 7) + 4 * np.log2(count),
+            color='rgb(255, 0, 0)',
+            opacity=0.9 if selected else 0.2,
+            symbol='circle'
+        ),
+        text=text,
+        hoverinfo='text',
+        name='High Risk Area (selected)' if selected else 'High Risk Area (not selected)'
+    )
+
+def build_map_figure(snapshot, high_risk_hospitals, waiting_time_slider, district_filter, start_date, end_date,
+                     level=None, viewport=None):
+    if level is None:
+        level = zoom_level(MAP_ZOOM)
+
+    hospital_awaiting_df = snapshot.hospital_awaiting_df
 
     #######################################
     ### 1. We filter out the points by applying masks to the points.
@@ -233,19 +419,6 @@ def plot_map(high_risk_hospitals, waiting_time_slider, district_filter, start_da
         (hospital_awaiting_df['topWait_value'] <= waiting_time_max)
     )
 
-    # date filter components
-    # the record is considered not within date range if:
-    # 1. the start date is later than the specified end_date, or
-    # 2. the end date is earlier than the specified start_date.
-    is_within_date = ~(
-        (high_risk_df['start_date'] > end_date) |
-        (high_risk_df['end_date'] < start_date)
-    )
-
-    # district filter components
-    is_within_district = high_risk_df['sub_district_en'].isin(district_filter)
-
-    
     # Establich masks to mask irrelevant dots
     # records to show are labeled with 1, records not to show are marked with 0
     hospital_awaiting_masks = (
@@ -253,18 +426,20 @@ def plot_map(high_risk_hospitals, waiting_time_slider, district_filter, start_da
     )
 
     # records to show are labeled with 1, records not to show are marked with 0
-    high_risk_masks = (
-        is_within_district &
-        is_within_date
-    )
+    # the record is considered not within date range if:
+    # 1. the start date is later than the specified end_date, or
+    # 2. the end date is earlier than the specified start_date.
+    # The date and district filters are answered by the per-snapshot index
+    high_risk_index = snapshot.derived('high_risk_index', build_high_risk_index)
+    high_risk_masks = high_risk_index.mask(district_filter, start_date, end_date)
+    # The same venue is listed once per case, a venue is selected if any of its records is
+    high_risk_venues = snapshot.derived('high_risk_venues', build_high_risk_venues)
+    high_risk_masks = high_risk_venues.mask(high_risk_masks)
 
     # Apply masks to highlight points
     hospital_awaiting_sharp_df = hospital_awaiting_df[hospital_awaiting_masks]
     hospital_awaiting_fade_df = hospital_awaiting_df[~hospital_awaiting_masks]
 
-    high_risk_sharp_df = high_risk_df[high_risk_masks]
-    high_risk_fade_df = high_risk_df[~high_risk_masks]
-
     #######################################
     ### 2. We plot the map, and the scatter points here.
     #######################################
@@ -275,43 +450,8 @@ def plot_map(high_risk_hospitals, waiting_time_slider, district_filter, start_da
     
 
     if 'show-high-risk' in high_risk_hospitals:
-        fig.add_trace(go.Scattermapbox(
-            lat=high_risk_sharp_df['lat'],
-            lon=high_risk_sharp_df['lng'],
-            mode='markers',
-            marker=go.scattermapbox.Marker(
-                size=10,
-                color='rgb(255, 0, 0)',
-                opacity=0.9,
-                symbol='circle'
-            ),
-            text=(
-                high_risk_sharp_df['location_en'] + '<br>' + 
-                high_risk_sharp_df['sub_district_en'] + '<br>' + 
-                high_risk_sharp_df['start_date'].dt.strftime("%Y-%m-%d") + ' - ' + high_risk_sharp_df['end_date'].dt.strftime("%Y-%m-%d")
-            ),
-            hoverinfo='text',
-            name='High Risk Area (selected)'
-        ))
-
-        fig.add_trace(go.Scattermapbox(
-            lat=high_risk_fade_df['lat'],
-            lon=high_risk_fade_df['lng'],
-            mode='markers',
-            marker=go.scattermapbox.Marker(
-                size=7,
-                color='rgb(255, 0, 0)',
-                opacity=0.2,
-                symbol='circle'
-            ),
-            text=(
-                high_risk_fade_df['location_en'] + '<br>' + 
-                high_risk_fade_df['sub_district_en'] + '<br>' + 
-                high_risk_fade_df['start_date'].dt.strftime("%Y-%m-%d") + ' - ' + high_risk_fade_df['end_date'].dt.strftime("%Y-%m-%d")
-            ),
-            hoverinfo='text',
-            name='High Risk Area (not selected)'
-        ))
+        fig.add_trace(high_risk_cluster_trace(snapshot, high_risk_masks, level, viewport, selected=True))
+        fig.add_trace(high_risk_cluster_trace(snapshot, ~high_risk_masks, level, viewport, selected=False))
 
     if 'show-hospitals' in high_risk_hospitals:
         fig.add_trace(go.Scattermapbox(
@@ -324,7 +464,7 @@ def plot_map(high_risk_hospitals, waiting_time_slider, district_filter, start_da
                 opacity=0.9,
                 symbol='circle'
             ),
-            text='<b>' + hospital_awaiting_sharp_df['address'] + '</b><br>Waiting time: ' + hospital_awaiting_sharp_df['topWait'] + ' hours',
+            text=hospital_awaiting_sharp_df['hover_text'],
             hoverinfo='text',
             name='Hospitals (selected)'
         ))
@@ -338,7 +478,7 @@ def plot_map(high_risk_hospitals, waiting_time_slider, district_filter, start_da
                 opacity=0.2,
                 symbol='circle'
             ),
-            text=hospital_awaiting_fade_df['address'] + ':\n Waiting time: ' + hospital_awaiting_fade_df['topWait'] + ' hours',
+            text=hospital_awaiting_fade_df['hover_text'],
             hoverinfo='text',
             name='Hospitals (not selected)'
         ))
@@ -350,13 +490,15 @@ def plot_map(high_risk_hospitals, waiting_time_slider, district_filter, start_da
         mapbox=go.layout.Mapbox(
             bearing=0,
             center=go.layout.mapbox.Center(
-                lat=22.302711,
-                lon=114.177216
+                lat=MAP_CENTER['lat'],
+                lon=MAP_CENTER['lon']
             ),
             pitch=0,
-            zoom=10,
+            zoom=MAP_ZOOM,
             style='carto-positron',
         ),
+        # Keep the user's zoom and position when the figure is replaced
+        uirevision='interactive-map',
         height=740,
         margin={'l': 0, 'r': 0, 'b': 0, 't': 0},
         legend_orientation="h",
@@ -366,23 +508,74 @@ def plot_map(high_risk_hospitals, waiting_time_slider, district_filter, start_da
 
     return fig
 
+def build_map_points(snapshot):
+    '''
+    Return the columns needed by the client-side map, as lists that can be sent as JSON
+    '''
+    high_risk_df = snapshot.high_risk_df
+    hospital_awaiting_df = snapshot.hospital_awaiting_df
+
+    def to_list(series):
+        series = series.astype(object)
+        return series.where(series.notnull(), None).tolist()
+
+    return {
+        'high_risk': {
+            'lat': to_list(high_risk_df['lat']),
+            'lng': to_list(high_risk_df['lng']),
+            'text': to_list(high_risk_df['hover_text']),
+            'district': to_list(high_risk_df['sub_district_en']),
+            'start_date': to_list(high_risk_df['start_date'].dt.strftime('%Y-%m-%d')),
+            'end_date': to_list(high_risk_df['end_date'].dt.strftime('%Y-%m-%d')),
+        },
+        'hospitals': {
+            'lat': to_list(hospital_awaiting_df['latitude']),
+            'lng': to_list(hospital_awaiting_df['longitude']),
+            'text': to_list(hospital_awaiting_df['hover_text']),
+            'wait': to_list(hospital_awaiting_df['topWait_value']),
+        },
+    }
+
+if CLIENTSIDE_MAP:
+    @app.callback(
+        [Output('map-points', 'data'), Output('map-points-version', 'data')],
+        [Input('snapshot-push', 'n_clicks')],
+        [State('map-points-version', 'data')]
+    )
+    def update_map_points(n, map_points_version):
+        '''
+        Send the map points to the browser, only when a new snapshot is published
+        '''
+        snapshot = get_snapshot()
+        if map_points_version == snapshot.version:
+            raise PreventUpdate
+        return snapshot.derived('map_points', build_map_points), snapshot.version
+
+    # The masks and traces are computed in the browser, see assets/map.js
+    app.clientside_callback(
+        ClientsideFunction(namespace='map', function_name='plot_map'),
+        Output('interactive-map', 'figure'),
+        map_filter_inputs + [Input('map-points', 'data')]
+    )
+else:
+    app.callback(Output('interactive-map', 'figure'), map_filter_inputs)(plot_map)
+
 ### We relocated the update_stats_cards() function to here
 
 @app.callback(
     Output('live-update-stats', 'children'),
-    [Input('interval-component', 'n_intervals')]
+    [Input('snapshot-push', 'n_clicks')]
 )
 def update_stats_cards(n):
     '''
     Return a list of four dbc.Col() objects. Corresponding to the number of Deaths, Confirmed, Investigating and Reported
     '''
-    # Get stats data
-    try:
-        cases_df = fetch_cases()
-        stats_df = calculate_stats(cases_df)
-    except Exception as e:
-        print(e)
-        print(f'Unable to get stats data online.')
+    # The cards only depend on the snapshot, they are built once per snapshot version
+    return get_snapshot().derived('stats_cards', build_stats_cards)
+
+def build_stats_cards(snapshot):
+    # Stats are computed by the background refresher, we only read the latest snapshot
+    stats_df = snapshot.stats_df
 
     death = stats_df.loc[0, 'death']
     confirmed = stats_df.loc[0, 'confirmed']
@@ -425,13 +618,73 @@ def update_stats_cards(n):
         ),
     ]
 
+#######################################
+### Epidemic curve, from the series maintained incrementally by epicurve.py
+#######################################
+
+@app.callback(
+    Output('epidemic-curve', 'figure'),
+    [
+        Input('epidemic-curve-split', 'value'),
+        Input('snapshot-push', 'n_clicks')
+    ]
+)
+def plot_epidemic_curve(split, n):
+    # The split names a memoized figure, so only the known dimensions are accepted
+    if split not in DIMENSIONS:
+        raise PreventUpdate
+    snapshot = get_snapshot()
+    # Fetched before the figure build, so that no derived() build runs inside another
+    series = snapshot.derived('epidemic_curve', build_epidemic_curve)
+    return snapshot.derived(f'epidemic_curve_figure_{split}', lambda s: build_epidemic_curve_figure(series, split))
+
+def build_epidemic_curve_figure(series, split):
+    daily = series['daily'][split]
+    total = series['total']
+
+    fig = go.Figure()
+    for value in daily.columns:
+        fig.add_trace(go.Bar(
+            x=daily.index,
+            y=daily[value],
+            name=str(value)
+        ))
+    fig.add_trace(go.Scatter(
+        x=total.index,
+        y=total['rolling_7d'],
+        mode='lines',
+        line={'color': 'black'},
+        name='7-day average'
+    ))
+    fig.add_trace(go.Scatter(
+        x=total.index,
+        y=total['cumulative'],
+        mode='lines',
+        line={'color': 'grey', 'dash': 'dot'},
+        yaxis='y2',
+        name='Cumulative'
+    ))
+
+    fig.update_layout(
+        barmode='stack',
+        hovermode='x',
+        height=400,
+        margin={'l': 40, 'r': 40, 'b': 40, 't': 10},
+        legend_orientation='h',
+        yaxis=dict(title='Daily cases'),
+        yaxis2=dict(title='Cumulative cases', overlaying='y', side='right', showgrid=False)
+    )
+    return fig
+
 ### Challenging Exercise
 @app.callback(
     Output('live-update-time', 'children'),
-    [Input('interval-component', 'n_intervals')]
+    [Input('snapshot-push', 'n_clicks')]
 )
 def update_time(n):
-    return html.P(f'Last update: {datetime.datetime.now(tz).strftime("%Y-%m-%d %H:%M:%S %Z%z")}', style={'text-align': 'right'})
+    # Called when the data changes rather than on a timer, show when the data was loaded
+    created_at = datetime.datetime.fromtimestamp(get_snapshot().created_at, tz)
+    return html.P(f'Last update: {created_at.strftime("%Y-%m-%d %H:%M:%S %Z%z")}', style={'text-align': 'right'})
 
 #######################################
 ### Dash initial setup 
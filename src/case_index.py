@@ -0,0 +1,45 @@
+import pandas as pd
+
+# The columns of cases_df shown on the case card
+CARD_FIELDS = ['case_no', 'status', 'age', 'gender', 'confirmation_date', 'citizenship_en', 'hospital_en']
+
+
+class CaseIndex(object):
+    """Per-snapshot index of the case card fields, keyed on case_no.
+
+    The fields are converted once to display values (dates as YYYY-MM-DD,
+    missing values as empty strings) and stored as plain lists, so a lookup
+    is a dictionary access and one list access per field, instead of a
+    boolean scan of cases_df and a copy of the whole row.
+
+    """
+
+    def __init__(self, cases_df, fields=CARD_FIELDS):
+        self.fields = fields
+        self.positions = {case_no: i for i, case_no in enumerate(cases_df['case_no'].tolist())}
+        self.values = {}
+        for field in fields:
+            col = cases_df[field]
+            if pd.api.types.is_datetime64_any_dtype(col):
+                col = col.dt.strftime('%Y-%m-%d')
+            col = col.astype(object)
+            self.values[field] = col.where(col.notnull(), '').tolist()
+
+    def __contains__(self, case_no):
+        return case_no in self.positions
+
+    def __len__(self):
+        return len(self.positions)
+
+    def get(self, case_no):
+        """Return a dictionary of the card fields of the case, None if there is no such case
+
+        """
+        position = self.positions.get(case_no)
+        if position is None:
+            return None
+        return {field: self.values[field][position] for field in self.fields}
+
+
+def build_case_index(snapshot):
+    return CaseIndex(snapshot.cases_df)
@@ -0,0 +1,104 @@
+import re
+import bisect
+import numpy as np
+import pandas as pd
+
+# Number of options returned per search, whatever the number of matches
+PAGE_SIZE = 50
+# The columns of cases_df a case can be found by
+SEARCH_FIELDS = ['case_no', 'age', 'gender', 'type_en', 'status']
+
+_token_pattern = re.compile(r'[^\W_]+')
+
+
+def tokenize(text):
+    return _token_pattern.findall(str(text).lower())
+
+
+def case_labels(cases_df):
+    """Return the label of every case in the case picker
+
+    """
+    def text(col):
+        # Missing values (NaN, None, or pd.NA of the nullable age) are shown as '-'
+        col = cases_df[col].astype(object)
+        return col.where(col.notnull(), '-').astype(str)
+
+    return (
+        '#' + text('case_no') + ': Age ' + text('age') + ' ' +
+        text('gender') + ', ' + text('type_en') + ' ' + text('status')
+    )
+
+
+class CaseSearchIndex(object):
+    """Per-snapshot prefix index of the cases, for the search-as-you-type case picker.
+
+    The cases are numbered from the latest to the oldest. Every token of the
+    searched fields maps to the sorted array of the numbers of the cases
+    having it, and the tokens are kept sorted, so the cases with a token
+    starting with a term are found by binary search. A query matches the
+    cases matching all of its terms, and returns at most one page of them,
+    latest first.
+
+    """
+
+    def __init__(self, cases_df, fields=SEARCH_FIELDS):
+        cases_df = cases_df.sort_values(by='case_no', ascending=False)
+        self.case_nos = [int(case_no) for case_no in cases_df['case_no']]
+        self.labels = case_labels(cases_df).tolist()
+        self.positions = {case_no: i for i, case_no in enumerate(self.case_nos)}
+
+        postings = {}
+        for field in fields:
+            for position, value in enumerate(cases_df[field].astype(object).tolist()):
+                if pd.isna(value):
+                    continue
+                for token in tokenize(value):
+                    postings.setdefault(token, set()).add(position)
+        self.tokens = sorted(postings)
+        self.postings = [np.array(sorted(postings[token]), dtype=np.int64) for token in self.tokens]
+
+    def option(self, position):
+        return {'label': self.labels[position], 'value': self.case_nos[position]}
+
+    def prefix_matches(self, term):
+        """Return the sorted positions of the cases having a token starting with term
+
+        """
+        lo = bisect.bisect_left(self.tokens, term)
+        hi = bisect.bisect_left(self.tokens, term + '\uffff')
+        if lo == hi:
+            return np.array([], dtype=np.int64)
+        return np.unique(np.concatenate(self.postings[lo:hi]))
+
+    def search(self, query, limit=PAGE_SIZE):
+        """Return the options of the first limit cases matching every term of the query
+
+        """
+        terms = tokenize(query or '')
+        if not terms:
+            positions = range(min(limit, len(self.case_nos)))
+        else:
+            matches = self.prefix_matches(terms[0])
+            for term in terms[1:]:
+                if not len(matches):
+                    break
+                matches = np.intersect1d(matches, self.prefix_matches(term), assume_unique=True)
+            positions = matches[:limit].tolist()
+        return [self.option(position) for position in positions]
+
+    def options(self, query, selected=None, limit=PAGE_SIZE):
+        """Return a page of options for the query, with the selected case first if it is not among them
+
+        The dropdown only displays a value that is among its options.
+
+        """
+        options = self.search(query, limit)
+        position = self.positions.get(selected)
+        if position is not None and all(option['value'] != selected for option in options):
+            options.insert(0, self.option(position))
+        return options
+
+
+def build_case_search_index(snapshot):
+    return CaseSearchIndex(snapshot.cases_df)
@@ -0,0 +1,43 @@
+import pandas as pd
+
+
+class DistrictVocabulary(object):
+    """The districts of the high risk areas, computed once per snapshot.
+
+    districts is the sorted list of English district names, counts the
+    number of high risk records per district, and names_zh the Chinese name
+    of every district (the most frequent one when the records disagree).
+
+    """
+
+    def __init__(self, high_risk_df):
+        districts_en = high_risk_df['sub_district_en'].astype(object)
+        districts_zh = high_risk_df['sub_district_zh'].astype(object)
+        valid = districts_en.notnull() & (districts_en != '')
+
+        counts = districts_en[valid].value_counts()
+        self.districts = sorted(counts.index)
+        self.counts = {district: int(counts[district]) for district in self.districts}
+
+        pairs = pd.DataFrame({'en': districts_en[valid], 'zh': districts_zh[valid]}).dropna()
+        names_zh = pairs.groupby('en')['zh'].agg(lambda names: names.value_counts().index[0]) if len(pairs) else {}
+        self.names_zh = {district: names_zh.get(district, '') for district in self.districts}
+
+    def __contains__(self, district):
+        return district in self.counts
+
+    def pairs(self):
+        """Return the (English, Chinese) names of the districts, in the order of districts
+
+        """
+        return [(district, self.names_zh[district]) for district in self.districts]
+
+    def options(self):
+        """Return the dropdown options of the districts
+
+        """
+        return [{'label': district, 'value': district} for district in self.districts]
+
+
+def build_district_vocabulary(snapshot):
+    return DistrictVocabulary(snapshot.high_risk_df)
@@ -0,0 +1,187 @@
+import threading
+import numpy as np
+import pandas as pd
+
+# Dimension name -> column of cases_df the daily counts are split by
+DIMENSIONS = {
+    'status': 'status_en',
+    'classification': 'classification_en',
+}
+ROLLING_DAYS = 7
+TOTAL_COLUMNS = ['daily', 'cumulative', 'rolling_7d', 'doubling_time']
+# Above this fraction of changed cases, the counts are seeded again rather than updated case by case
+REBUILD_FRACTION = 0.1
+
+
+class EpidemicCurve(object):
+    """Daily case counts maintained incrementally from one snapshot to the next.
+
+    The first update seeds the counts with one crosstab per dimension. Later
+    updates compare every case with the version seen in the previous
+    snapshot: only new, changed or removed cases are applied to the counts,
+    and only the days they fall on (and the days after them, for the
+    cumulative and rolling series) are recomputed. When more than
+    REBUILD_FRACTION of the cases changed, the counts are seeded again.
+
+    """
+
+    def __init__(self, date_column='confirmation_date'):
+        self.date_column = date_column
+        # Version of the snapshot the counts correspond to
+        self.version = None
+        # case_no -> (date, status, classification) as counted
+        self._cases = {}
+        # dimension -> DataFrame of daily counts, indexed by date with one column per value
+        self._daily = {dim: pd.DataFrame(dtype='int64') for dim in DIMENSIONS}
+        self._total = pd.DataFrame(columns=TOTAL_COLUMNS, dtype='float64')
+        self._lock = threading.Lock()
+
+    def _case_attributes(self, cases_df):
+        columns = [cases_df['case_no']] + [cases_df[self.date_column]] + [cases_df[col] for col in DIMENSIONS.values()]
+        columns = [col.astype(object).where(col.notnull(), None) for col in columns]
+        return {row[0]: tuple(row[1:]) for row in zip(*columns)}
+
+    def _seed(self, cases_df):
+        """Recount everything from cases_df, with one crosstab per dimension
+
+        """
+        dates = pd.to_datetime(cases_df[self.date_column])
+        for dim, col in DIMENSIONS.items():
+            values = cases_df[col].astype(object)
+            values = values.where(values.notnull(), 'Unknown')
+            daily = pd.crosstab(dates, values)
+            daily.index.name = None
+            daily.columns.name = None
+            self._daily[dim] = daily.astype('int64')
+        self._total = pd.DataFrame(columns=TOTAL_COLUMNS, dtype='float64')
+
+    def _apply(self, attributes, delta):
+        date = attributes[0]
+        for i, dim in enumerate(DIMENSIONS):
+            value = attributes[i + 1]
+            if value is None:
+                value = 'Unknown'
+            daily = self._daily[dim]
+            if value not in daily.columns:
+                daily[value] = 0
+            if date not in daily.index:
+                daily.loc[date] = 0
+            daily.loc[date, value] += delta
+
+    def update(self, cases_df, version=None):
+        """Apply the differences between cases_df and the previously seen cases. Return the affected dates.
+
+        """
+        with self._lock:
+            return self._update(cases_df, version)
+
+    def advance(self, cases_df, version):
+        """Update the counts to the snapshot version and return the series, atomically.
+
+        Return None, without changing anything, if the counts already
+        correspond to this version or a newer one.
+
+        """
+        with self._lock:
+            if self.version is not None and version <= self.version:
+                return None
+            self._update(cases_df, version)
+            return self._series()
+
+    def _update(self, cases_df, version):
+        cases = self._case_attributes(cases_df)
+
+        changes = []
+        for case_no, attributes in cases.items():
+            previous = self._cases.get(case_no)
+            if previous != attributes:
+                changes.append((previous, attributes))
+        for case_no in set(self._cases) - set(cases):
+            changes.append((self._cases[case_no], None))
+
+        affected = set()
+        for previous, attributes in changes:
+            for counted in (previous, attributes):
+                if counted is not None and counted[0] is not None:
+                    affected.add(counted[0])
+
+        if not self._cases or len(changes) > REBUILD_FRACTION * len(cases):
+            self._seed(cases_df)
+            first_affected = self._daily['status'].index.min() if len(self._daily['status']) else None
+        else:
+            for previous, attributes in changes:
+                if previous is not None and previous[0] is not None:
+                    self._apply(previous, -1)
+                if attributes is not None and attributes[0] is not None:
+                    self._apply(attributes, 1)
+            first_affected = min(affected) if affected else None
+
+        self._cases = cases
+        self.version = version
+        if first_affected is not None:
+            self._update_total(first_affected)
+        return affected
+
+    def _update_total(self, first_affected):
+        """Recompute the total series from the first affected date onwards.
+
+        """
+        for dim in DIMENSIONS:
+            daily = self._daily[dim]
+            daily.index = pd.DatetimeIndex(daily.index)
+            daily = daily.sort_index()
+            full_range = pd.date_range(daily.index.min(), daily.index.max(), freq='D')
+            self._daily[dim] = daily.reindex(full_range, fill_value=0).astype('int64')
+
+        daily = self._daily['status'].sum(axis=1)
+        total = self._total.reindex(daily.index)
+
+        # Days before first_affected are unchanged, except for the rolling window reaching into them
+        start = pd.Timestamp(first_affected)
+        window_start = start - pd.Timedelta(days=ROLLING_DAYS - 1)
+        previous = total.loc[:start - pd.Timedelta(days=1), 'cumulative'].dropna()
+        offset = previous.iloc[-1] if len(previous) else 0
+
+        tail = daily.loc[start:]
+        total.loc[start:, 'daily'] = tail
+        total.loc[start:, 'cumulative'] = tail.cumsum() + offset
+        total.loc[start:, 'rolling_7d'] = daily.loc[window_start:].rolling(ROLLING_DAYS, min_periods=1).mean().loc[start:]
+
+        # Doubling time in days, from the growth of the cumulative count over the rolling window
+        cumulative = total['cumulative']
+        growth = cumulative / cumulative.shift(ROLLING_DAYS)
+        doubling_time = ROLLING_DAYS * np.log(2) / np.log(growth.where(growth > 1))
+        total.loc[start:, 'doubling_time'] = doubling_time.loc[start:]
+
+        self._total = total
+
+    def series(self):
+        """Return a copy of the precomputed series: the daily counts per dimension and the totals.
+
+        """
+        with self._lock:
+            return self._series()
+
+    def _series(self):
+        return {
+            'daily': {dim: daily.copy() for dim, daily in self._daily.items()},
+            'total': self._total.copy(),
+        }
+
+
+def build_epidemic_curve(snapshot):
+    """Return the series of the snapshot.
+
+    The curve is kept in the snapshot's lineage (the chain of snapshots
+    published one after the other), so a new snapshot only applies its
+    differences with the previous one. A snapshot older than the curve is
+    counted on its own, without moving the shared curve backwards.
+
+    """
+    curve = snapshot.lineage.setdefault('epidemic_curve', EpidemicCurve())
+    series = curve.advance(snapshot.cases_df, snapshot.version)
+    if series is None:
+        curve = EpidemicCurve()
+        curve.update(snapshot.cases_df, snapshot.version)
+        series = curve.series()
+    return series
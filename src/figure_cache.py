@@ -0,0 +1,55 @@
+import threading
+from collections import OrderedDict
+
+
+class FigureCache(object):
+    """A thread-safe LRU cache for figures, keyed by the snapshot version and the normalized filter state.
+
+    When the cache holds more than maxsize figures, the least recently used one
+    is evicted. The hits, misses and evictions counters are kept for monitoring.
+
+    """
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._figures = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_build(self, key, build):
+        """Return the figure cached under key, or build it with build() and cache it.
+
+        """
+        with self._lock:
+            if key in self._figures:
+                self._figures.move_to_end(key)
+                self.hits += 1
+                return self._figures[key]
+            self.misses += 1
+
+        # Build outside the lock, so a slow figure does not block cache hits
+        figure = build()
+
+        with self._lock:
+            self._figures[key] = figure
+            self._figures.move_to_end(key)
+            while len(self._figures) > self.maxsize:
+                self._figures.popitem(last=False)
+                self.evictions += 1
+        return figure
+
+    def clear(self):
+        with self._lock:
+            self._figures.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._figures),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
@@ -0,0 +1,223 @@
+import os
+import re
+import json
+import time
+import threading
+import pandas as pd
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+data_dir = os.path.join(dir_path, '..', 'data')
+
+# Nominatim's usage policy allows at most one request per second
+MIN_DELAY_SECONDS = 1
+MAX_RETRIES = 3
+# Addresses that could not be resolved are retried after this many seconds
+NEGATIVE_TTL_SECONDS = 7 * 24 * 3600
+
+# Locations that geocoders cannot resolve, matched on the English or Chinese name
+KNOWN_LOCATIONS = [
+    (lambda row: 'high speed rail' in row['address'].lower(), (22.304080, 114.166501)),
+    (lambda row: '航空' in str(row['location_zh']), (22.308007, 113.918803)),
+]
+
+
+def normalize_address(address):
+    """Return the cache key of an address: lower case, single spaces, without a trailing 'Hong Kong'
+
+    """
+    address = re.sub(r'\s+', ' ', str(address)).strip().lower()
+    address = re.sub(r'(,\s*hong kong)+$', '', address)
+    return address
+
+
+def pop_address(address):
+    address_lst = address.split(',')
+    return ','.join(address_lst[1:]).strip()
+
+
+class StubGeocoder(object):
+    """Offline geocoder answering from a dictionary of normalized address to (lat, lng)
+
+    It has the same geocode() interface as the geopy geocoders, so the service
+    can be exercised without network access.
+
+    """
+
+    class Location(object):
+        def __init__(self, latitude, longitude):
+            self.latitude = latitude
+            self.longitude = longitude
+
+    def __init__(self, coordinates):
+        self.coordinates = {normalize_address(address): latlng for address, latlng in coordinates.items()}
+        self.queries = []
+
+    def geocode(self, query):
+        self.queries.append(query)
+        latlng = self.coordinates.get(normalize_address(query))
+        return self.Location(*latlng) if latlng else None
+
+
+class GeocodingService(object):
+    """Resolve addresses to coordinates with a persistent cache and a rate-limited geocoder.
+
+    Results are cached on disk by normalized address, including the addresses
+    that could not be resolved (negative caching, retried after
+    NEGATIVE_TTL_SECONDS). An address whose queries failed with an error is
+    not cached, and is tried again on the next call. Only cache misses reach
+    the geocoder, at most one request every min_delay seconds.
+
+    """
+
+    def __init__(self, geocoder=None, cache_path=os.path.join(data_dir, 'GEOCODE_CACHE.json'),
+                 min_delay=MIN_DELAY_SECONDS, max_retries=MAX_RETRIES, sleep=time.sleep, clock=time.time):
+        if geocoder is None:
+            from geopy.geocoders import Nominatim
+            geocoder = Nominatim(user_agent='hk_explorer')
+        self.geocoder = geocoder
+        self.cache_path = cache_path
+        self.min_delay = min_delay
+        self.max_retries = max_retries
+        self.sleep = sleep
+        self.clock = clock
+        self._last_request = None
+        self._lock = threading.Lock()
+        self.cache = self._load_cache()
+
+    def _load_cache(self):
+        if self.cache_path is None:
+            return {}
+        try:
+            with open(self.cache_path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save_cache(self):
+        if self.cache_path is None:
+            return
+        tmp_path = self.cache_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.cache, f, ensure_ascii=False, indent=0, sort_keys=True)
+        os.replace(tmp_path, self.cache_path)
+
+    def _cached(self, key):
+        """Return (hit, coordinates), coordinates being (None, None) for a negative hit
+
+        """
+        entry = self.cache.get(key)
+        if entry is None:
+            return False, None
+        if entry['lat'] is None and self.clock() - entry['resolved_at'] > NEGATIVE_TTL_SECONDS:
+            return False, None
+        return True, (entry['lat'], entry['lng'])
+
+    def _geocode(self, query):
+        """Query the geocoder, waiting as needed to respect the rate limit and retrying on errors only
+
+        Raises the last error if every trial failed.
+
+        """
+        error = None
+        for trial in range(self.max_retries):
+            if self._last_request is not None:
+                wait = self.min_delay - (self.clock() - self._last_request)
+                if wait > 0:
+                    self.sleep(wait)
+            self._last_request = self.clock()
+            try:
+                return self.geocoder.geocode(query)
+            except Exception as e:
+                print(f'Geocoding {query} failed ({e}), trial {trial + 1} of {self.max_retries}')
+                error = e
+        raise error
+
+    def resolve(self, address):
+        """Return the (lat, lng) of the address, (None, None) if it cannot be found
+
+        The address is tried as is, then without its first and second
+        comma-separated parts, like the original get_coordinates().
+
+        """
+        key = normalize_address(address)
+        with self._lock:
+            hit, coordinates = self._cached(key)
+            if hit:
+                return coordinates
+
+            location = None
+            query = address + ', Hong Kong'
+            for _ in range(3):
+                try:
+                    location = self._geocode(query)
+                except Exception:
+                    # Not a real 'not found', do not cache it
+                    return None, None
+                if location is not None or ',' not in query:
+                    break
+                query = pop_address(query)
+
+            coordinates = (location.latitude, location.longitude) if location else (None, None)
+            self.cache[key] = {'lat': coordinates[0], 'lng': coordinates[1], 'resolved_at': self.clock()}
+            return coordinates
+
+    def resolve_many(self, addresses, save_every=50):
+        """Return a dictionary of address to (lat, lng), geocoding each distinct uncached address once
+
+        The cache is saved every save_every geocoded addresses and at the end,
+        so an interrupted batch does not lose its progress.
+
+        """
+        results = {}
+        resolved = 0
+        for address in dict.fromkeys(addresses):
+            hit = self._cached(normalize_address(address))[0]
+            results[address] = self.resolve(address)
+            if not hit:
+                resolved += 1
+                if resolved % save_every == 0:
+                    self.save_cache()
+        self.save_cache()
+        return results
+
+
+def update_address(address_df, high_risk_df, service=None):
+    """Return address_df with rows appended for the locations of high_risk_df it does not have yet
+
+    All the unseen locations are resolved in one batch and appended with a
+    single concat, instead of one DataFrame.append per location.
+
+    """
+    unseen_df = high_risk_df[
+        ~high_risk_df['location_en'].isin(address_df['location_en'])
+    ][
+        ['id', 'sub_district_zh', 'sub_district_en', 'location_en', 'location_zh']
+    ].drop_duplicates(
+        subset=['sub_district_en', 'location_en']
+    ).astype(object).reset_index(drop=True)
+
+    if unseen_df.empty:
+        return address_df
+
+    unseen_df['address'] = unseen_df['location_en'].fillna('') + ', ' + unseen_df['sub_district_en'].fillna('')
+    latitudes = []
+    longitudes = []
+    to_resolve = []
+    for _, row in unseen_df.iterrows():
+        known = [latlng for matches, latlng in KNOWN_LOCATIONS if matches(row)]
+        latitudes.append(known[0][0] if known else None)
+        longitudes.append(known[0][1] if known else None)
+        if not known:
+            to_resolve.append(row['address'])
+
+    if to_resolve:
+        service = service or GeocodingService()
+        resolved = service.resolve_many(to_resolve)
+        for i, address in enumerate(unseen_df['address']):
+            if address in resolved:
+                latitudes[i], longitudes[i] = resolved[address]
+
+    unseen_df['latitude'] = latitudes
+    unseen_df['longitude'] = longitudes
+
+    return pd.concat([address_df, unseen_df.drop(columns=['address'])], ignore_index=True, sort=False)
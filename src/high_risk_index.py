@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+
+_MIN = np.iinfo(np.int64).min
+_MAX = np.iinfo(np.int64).max
+
+
+class HighRiskIndex(object):
+    """Per-snapshot index answering the date and district filters of the map.
+
+    The date-overlap query uses the start dates and the end dates sorted
+    separately: the records starting before the end of the range are a prefix
+    of the first, the records ending after the start of the range are a suffix
+    of the second. Both are found by binary search, and only the smaller of the
+    two candidate sets is checked against the other condition.
+
+    The districts are stored as packed bitmaps of the row positions, so that a
+    district selection is an OR of bitmaps and the final filter a bitmap AND.
+
+    """
+
+    def __init__(self, high_risk_df):
+        self.size = high_risk_df.shape[0]
+
+        # Missing dates never exclude a record, as in the original pandas comparison
+        starts = high_risk_df['start_date'].values.astype('datetime64[ns]').astype(np.int64)
+        ends = high_risk_df['end_date'].values.astype('datetime64[ns]').astype(np.int64)
+        starts = np.where(pd.isnull(high_risk_df['start_date']).values, _MIN, starts)
+        ends = np.where(pd.isnull(high_risk_df['end_date']).values, _MAX, ends)
+
+        self.starts = starts
+        self.ends = ends
+        self.start_order = np.argsort(starts, kind='mergesort')
+        self.sorted_starts = starts[self.start_order]
+        self.end_order = np.argsort(ends, kind='mergesort')
+        self.sorted_ends = ends[self.end_order]
+
+        self.district_bitmaps = {}
+        districts = high_risk_df['sub_district_en'].astype(object).values
+        for district, positions in pd.Series(np.arange(self.size)).groupby(districts).groups.items():
+            bitmap = np.zeros(self.size, dtype=bool)
+            bitmap[np.asarray(positions)] = True
+            self.district_bitmaps[district] = np.packbits(bitmap)
+        self._empty_bitmap = np.packbits(np.zeros(self.size, dtype=bool))
+
+    @staticmethod
+    def _to_int(date, default):
+        if date is None:
+            return default
+        return pd.Timestamp(date).value
+
+    def date_positions(self, start_date, end_date):
+        """Return the row positions of the records overlapping [start_date, end_date].
+
+        """
+        start_q = self._to_int(start_date, _MIN)
+        end_q = self._to_int(end_date, _MAX)
+
+        # start <= end_q: a prefix of the start-sorted rows
+        n_starting = np.searchsorted(self.sorted_starts, end_q, side='right')
+        # end >= start_q: a suffix of the end-sorted rows
+        first_ending = np.searchsorted(self.sorted_ends, start_q, side='left')
+
+        if n_starting <= self.size - first_ending:
+            candidates = self.start_order[:n_starting]
+            return candidates[self.ends[candidates] >= start_q]
+        candidates = self.end_order[first_ending:]
+        return candidates[self.starts[candidates] <= end_q]
+
+    def date_bitmap(self, start_date, end_date):
+        bitmap = np.zeros(self.size, dtype=bool)
+        bitmap[self.date_positions(start_date, end_date)] = True
+        return np.packbits(bitmap)
+
+    def district_bitmap(self, districts):
+        bitmap = self._empty_bitmap
+        for district in districts:
+            if district in self.district_bitmaps:
+                bitmap = bitmap | self.district_bitmaps[district]
+        return bitmap
+
+    def mask(self, districts, start_date, end_date):
+        """Return the boolean mask of the records in the districts and overlapping the date range.
+
+        """
+        bitmap = self.district_bitmap(districts) & self.date_bitmap(start_date, end_date)
+        return np.unpackbits(bitmap)[:self.size].astype(bool)
+
+
+def build_high_risk_index(snapshot):
+    return HighRiskIndex(snapshot.high_risk_df)
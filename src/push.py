@@ -0,0 +1,77 @@
+import os
+import json
+import time
+import threading
+from flask import Response
+from snapshot import get_snapshot, wait_for_snapshot
+
+EVENTS_PATH = '/_snapshot-events'
+# A comment is sent when nothing happened for this long, so proxies keep the connection open
+HEARTBEAT_SECONDS = 15
+# Streams are closed after this long, the browser reconnects after RETRY_MILLISECONDS
+STREAM_SECONDS = 300
+RETRY_MILLISECONDS = 5000
+# Each open stream holds a server thread while it waits. At most MAX_STREAMS are held per process,
+# so callbacks and page loads always have threads left. The clients beyond that get the current
+# version at once and are told to check again after POLL_MILLISECONDS, without holding a thread.
+MAX_STREAMS = int(os.environ.get('SSE_MAX_STREAMS', 8))
+POLL_MILLISECONDS = 60 * 1000
+
+_stream_slots = threading.BoundedSemaphore(MAX_STREAMS)
+
+
+def snapshot_event(snapshot):
+    data = json.dumps({'version': snapshot.version if snapshot else None})
+    return f'event: snapshot\ndata: {data}\n\n'
+
+
+def snapshot_events(heartbeat=HEARTBEAT_SECONDS, lifetime=STREAM_SECONDS, clock=time.monotonic):
+    """Generate the server-sent events of one client: the current version, then one event per new snapshot
+
+    Between snapshots the generator waits on the publish notification, so a
+    connected client costs nothing but a heartbeat every heartbeat seconds.
+
+    """
+    yield f'retry: {RETRY_MILLISECONDS}\n\n'
+    snapshot = get_snapshot()
+    yield snapshot_event(snapshot)
+
+    version = snapshot.version if snapshot else None
+    deadline = clock() + lifetime
+    while clock() < deadline:
+        snapshot = wait_for_snapshot(version, timeout=min(heartbeat, max(deadline - clock(), 0)))
+        if snapshot is not None and snapshot.version != version:
+            version = snapshot.version
+            yield snapshot_event(snapshot)
+        else:
+            yield ': heartbeat\n\n'
+
+
+def limited_snapshot_events(slots=_stream_slots):
+    """Stream the snapshot events if a stream slot is free, otherwise send one event and close
+
+    The slot is taken when the response starts to be sent and released when
+    the stream ends or the client disconnects.
+
+    """
+    if not slots.acquire(blocking=False):
+        yield f'retry: {POLL_MILLISECONDS}\n\n'
+        yield snapshot_event(get_snapshot())
+        return
+    try:
+        yield from snapshot_events()
+    finally:
+        slots.release()
+
+
+def init_app(server, path=EVENTS_PATH):
+    """Serve the snapshot events on path, see assets/push.js for the client side
+
+    """
+    def snapshot_events_view():
+        return Response(
+            limited_snapshot_events(),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+    server.add_url_rule(path, 'snapshot_events', snapshot_events_view)
@@ -0,0 +1,153 @@
+import threading
+import time
+from snapshot import Snapshot, publish_snapshot, get_snapshot
+from snapshot_store import store_available, read_current_version, read_snapshot, write_snapshot, StoreLock
+from wuhan_functions import load_data_with_report, load_data_local, REMOTE_SOURCES
+
+DEFAULT_REFRESH_INTERVAL = 60
+DEFAULT_POLL_INTERVAL = 5
+
+
+class Refresher(threading.Thread):
+    """Background thread that reloads the data on a schedule and publishes a new Snapshot.
+
+    Callbacks only ever read the published snapshot, so the upstream site is
+    hit once per interval, no matter how many clients are connected.
+
+    When the shared snapshot store is available, only one process (the one
+    holding the store lock) loads the data and writes it to the store. The
+    other processes poll the store and map the new version when it changes,
+    so all gunicorn workers serve the same data.
+
+    """
+
+    def __init__(self, interval=DEFAULT_REFRESH_INTERVAL, loader=None, poll_interval=DEFAULT_POLL_INTERVAL):
+        super(Refresher, self).__init__(name='snapshot-refresher', daemon=True)
+        self.interval = interval
+        self.poll_interval = min(poll_interval, interval)
+        self.loader = loader
+        self.use_store = store_available()
+        self.lock = StoreLock() if self.use_store else None
+        self._last_load = 0
+        self._stop_event = threading.Event()
+        self.refresh_on_start = False
+
+    def is_leader(self):
+        return not self.use_store or self.lock.acquire()
+
+    def load_data(self):
+        """Return (data, report) from the custom loader, or from the source cascade.
+
+        Once a snapshot is published, only the remote sources are raced: falling
+        back to the local files would replace fresher data with older data.
+
+        """
+        if self.loader is not None:
+            return self.loader(), None
+        sources = None if get_snapshot() is None else REMOTE_SOURCES
+        return load_data_with_report(live=True, sources=sources)
+
+    def load(self):
+        start = time.time()
+        data, report = self.load_data()
+        snapshot = Snapshot(*data, load_report=report)
+        self._last_load = time.time()
+
+        # Unchanged data keeps the published snapshot, with its version, its derived artifacts
+        # and the caches keyed on it, and nothing is pushed to the clients
+        current = get_snapshot()
+        if current is not None and current.fingerprint() == snapshot.fingerprint():
+            print(f'Data unchanged, keeping snapshot {current.version} ({time.time() - start:.2f}s)')
+            return current
+
+        if self.use_store and self.is_leader():
+            try:
+                write_snapshot(snapshot)
+            except Exception as e:
+                print(e)
+                print(f'Unable to write snapshot {snapshot.version} to the store.')
+        publish_snapshot(snapshot)
+        print(f'Published snapshot {snapshot.version} in {time.time() - start:.2f}s')
+        return snapshot
+
+    def sync(self):
+        """Publish the store's current snapshot if it is newer than ours. Return True if it was.
+
+        """
+        version = read_current_version()
+        current = get_snapshot()
+        if version is None or (current is not None and current.version >= version):
+            return False
+        publish_snapshot(read_snapshot(version=version))
+        print(f'Mapped snapshot {version} from the store')
+        return True
+
+    def refresh(self):
+        if self.is_leader():
+            if time.time() - self._last_load >= self.interval or get_snapshot() is None:
+                return self.load()
+        elif self.sync():
+            return get_snapshot()
+        elif get_snapshot() is None:
+            # The leader has not written anything yet, do not wait for it
+            return self.load()
+        return get_snapshot()
+
+    def run(self):
+        if self.refresh_on_start:
+            try:
+                self.refresh()
+            except Exception as e:
+                print(e)
+                print(f'Refreshing data failed, keeping the local snapshot.')
+        while not self._stop_event.wait(self.poll_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                print(e)
+                print(f'Refreshing data failed, keeping the previous snapshot.')
+
+    def stop(self):
+        self._stop_event.set()
+
+
+def load_local_snapshot():
+    """Return the last snapshot available on local disk, without any network access.
+
+    The shared store is tried first, then the seed snapshot and the csv files.
+
+    """
+    if store_available():
+        try:
+            snapshot = read_snapshot()
+            if snapshot is not None:
+                return snapshot
+        except Exception as e:
+            print(e)
+            print(f'Unable to read the snapshot store, loading local files.')
+    # Version 0 so that any snapshot from the store or a live load is considered newer
+    return Snapshot(*load_data_local(), version=0)
+
+
+_refresher = None
+
+
+def start_refresher(interval=DEFAULT_REFRESH_INTERVAL, loader=None, blocking=True):
+    """Start the background refresher once per process and return it.
+
+    With blocking=True the first snapshot is loaded (or mapped from the store)
+    before returning. Otherwise the last local snapshot is published right
+    away and fresh data is swapped in by the background thread.
+
+    """
+    global _refresher
+    if _refresher is None or not _refresher.is_alive():
+        _refresher = Refresher(interval=interval, loader=loader)
+        if get_snapshot() is None:
+            if blocking:
+                _refresher.refresh()
+            else:
+                publish_snapshot(load_local_snapshot())
+                _refresher.refresh_on_start = True
+        _refresher.start()
+    return _refresher
@@ -0,0 +1,140 @@
+import gzip
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from flask import request, g, make_response
+
+UPDATE_COMPONENT_PATH = '/_dash-update-component'
+
+
+class ResponseCache(object):
+    """Serve repeated Dash callback responses from memory, with strong ETags.
+
+    Only the callback outputs listed in outputs are cached: their response
+    must only depend on the snapshot version and the callback inputs. For
+    every output, outputs gives the component ids whose values are left out
+    of the key (e.g. the interval, for outputs refreshed on a timer but only
+    changing with the data).
+
+    A response is serialized and gzipped once, then served as is to every
+    identical request until the snapshot version changes, without running
+    the callback. A request carrying the ETag in If-None-Match gets a 304.
+    The gzipped and the plain body of a response have different ETags, as
+    strong validators must change with the content-coding.
+
+    """
+
+    def __init__(self, get_version, outputs, maxsize=256, compress_level=6):
+        self.get_version = get_version
+        self.outputs = outputs
+        self.maxsize = maxsize
+        self.compress_level = compress_level
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self._responses = OrderedDict()
+        self._lock = threading.Lock()
+
+    def init_app(self, server):
+        # after_request functions run in the reverse order of registration, so
+        # this one runs before Flask-Compress, which skips the gzipped responses
+        server.before_request(self.before_request)
+        server.after_request(self.after_request)
+
+    def _key(self):
+        """Return (version, etag) for a cacheable callback request, None otherwise
+
+        """
+        if request.method != 'POST' or request.path != UPDATE_COMPONENT_PATH:
+            return None
+        body = request.get_json(silent=True)
+        if not body or body.get('output') not in self.outputs:
+            return None
+
+        ignored = self.outputs[body['output']]
+        values = [
+            (item.get('id'), item.get('property'), item.get('value'))
+            for item in body.get('inputs', []) + body.get('state', [])
+            if item.get('id') not in ignored
+        ]
+        version = self.get_version()
+        payload = json.dumps([version, body['output'], values], sort_keys=True, default=str)
+        return version, '"' + hashlib.sha1(payload.encode('utf-8')).hexdigest() + '"'
+
+    def _encoded_etag(self, etag):
+        """Return the ETag of the body sent for this request: every cached response is also gzipped
+
+        """
+        if 'gzip' in request.headers.get('Accept-Encoding', '').lower():
+            return etag[:-1] + '-gzip"'
+        return etag
+
+    def _respond(self, etag, data, gzipped):
+        etag = self._encoded_etag(etag)
+        if request.if_none_match.contains(etag.strip('"')):
+            self.not_modified += 1
+            response = make_response('', 304)
+        elif gzipped is not None and etag.endswith('-gzip"'):
+            response = make_response(gzipped)
+            response.headers['Content-Encoding'] = 'gzip'
+        else:
+            response = make_response(data)
+        response.headers['ETag'] = etag
+        response.headers['Vary'] = 'Accept-Encoding'
+        response.mimetype = 'application/json'
+        g.response_cache_done = True
+        return response
+
+    def before_request(self):
+        key = self._key()
+        if key is None:
+            return None
+        version, etag = key
+        g.response_cache_key = key
+
+        with self._lock:
+            cached = self._responses.get(etag)
+            if cached is not None:
+                self._responses.move_to_end(etag)
+                self.hits += 1
+            else:
+                self.misses += 1
+        if cached is not None:
+            return self._respond(etag, *cached)
+        if request.if_none_match.contains(self._encoded_etag(etag).strip('"')):
+            # The client holds the response for this version and these inputs already
+            return self._respond(etag, None, None)
+        return None
+
+    def after_request(self, response):
+        key = g.pop('response_cache_key', None)
+        if g.pop('response_cache_done', False) or key is None or response.status_code != 200:
+            return response
+        version, etag = key
+        # The data changed while the callback ran, the response is not the one of the key
+        if self.get_version() != version:
+            return response
+
+        data = response.get_data()
+        gzipped = gzip.compress(data, compresslevel=self.compress_level)
+        with self._lock:
+            self._responses[etag] = (data, gzipped)
+            self._responses.move_to_end(etag)
+            while len(self._responses) > self.maxsize:
+                self._responses.popitem(last=False)
+        return self._respond(etag, data, gzipped)
+
+    def clear(self):
+        with self._lock:
+            self._responses.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._responses),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'not_modified': self.not_modified,
+            }
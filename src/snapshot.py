@@ -0,0 +1,186 @@
+import threading
+import time
+import hashlib
+import pandas as pd
+from wuhan_functions import calculate_stats, calculate_breakdowns, split_case_details, empty_case_details_df, get_case_details
+from districts import build_district_vocabulary
+
+
+class Snapshot(object):
+    """An immutable bundle of the DataFrames served by the dashboard.
+
+    A new Snapshot is built every time the data is refreshed and is never
+    modified afterwards, so callbacks can read it without any locking.
+
+    """
+
+    def __init__(self, cases_df, high_risk_df, stats_df, hospital_awaiting_df, version=None, created_at=None, load_report=None,
+                 case_details=None):
+        # The lazy detail columns are kept apart from cases_df, see case_details()
+        self.cases_df, details_df = split_case_details(cases_df)
+        # A DataFrame indexed by case_no, or a function returning one, called on first use
+        self._case_details = case_details if case_details is not None else details_df
+        self.high_risk_df = high_risk_df
+        # None when the loader left the stats to be derived from the breakdowns, see stats_df
+        self._stats_df = stats_df
+        self.hospital_awaiting_df = hospital_awaiting_df
+        self.created_at = created_at if created_at is not None else time.time()
+        self.version = version if version is not None else int(self.created_at * 1000)
+        # Which source the data came from and how long each source took, see load_data_with_report()
+        self.load_report = load_report
+        # State shared with the snapshots published before and after this one, see publish_snapshot()
+        self.lineage = {}
+        self._derived = {}
+        # One lock per artifact, so that a build can use other derived artifacts
+        self._derived_locks = {}
+        self._derived_lock = threading.Lock()
+
+    @property
+    def stats_df(self):
+        """The death / confirmed / discharged / hospitalised counts, see calculate_stats()
+
+        """
+        return self.derived('stats', build_stats)
+
+    def as_tuple(self):
+        return self.cases_df, self.high_risk_df, self.stats_df, self.hospital_awaiting_df
+
+    def derived(self, name, build):
+        """Return the artifact called name, computing it with build(snapshot) on first use.
+
+        Derived artifacts only depend on the snapshot's data, so they are
+        computed once per snapshot version and shared by all callbacks.
+        Every name is built under its own lock: concurrent requests for the
+        same artifact wait for a single build, and a build may itself call
+        derived() for other names.
+
+        """
+        try:
+            return self._derived[name]
+        except KeyError:
+            pass
+        with self._derived_lock:
+            lock = self._derived_locks.setdefault(name, threading.Lock())
+        with lock:
+            if name not in self._derived:
+                self._derived[name] = build(self)
+            return self._derived[name]
+
+    def fingerprint(self):
+        """Hash of the contents of the tables, equal for snapshots holding the same data
+
+        """
+        return self.derived('fingerprint', lambda snapshot: fingerprint_tables(
+            snapshot.as_tuple() + (snapshot.case_details_df().reset_index(),)
+        ))
+
+    def case_details_df(self):
+        """The lazy detail columns of the cases of this snapshot, indexed by case_no
+
+        """
+        return self.derived('case_details', load_case_details)
+
+    def case_details(self, case_no):
+        """Return a dictionary of the lazy columns of a case, with empty strings when unknown
+
+        """
+        return get_case_details(self.case_details_df(), case_no)
+
+    def layout_options(self):
+        return self.derived('layout_options', build_layout_options)
+
+    def breakdowns(self):
+        """Case counts by status, classification, type, age band and confirmation date, see calculate_breakdowns()
+
+        """
+        return self.derived('breakdowns', lambda snapshot: calculate_breakdowns(snapshot.cases_df))
+
+    def districts(self):
+        """Sorted districts, counts per district and English/Chinese names, see DistrictVocabulary
+
+        """
+        return self.derived('districts', build_district_vocabulary)
+
+
+def load_case_details(snapshot):
+    details = snapshot._case_details
+    if callable(details):
+        try:
+            details = details()
+        except Exception as e:
+            print(e)
+            print(f'Unable to load the case details of snapshot {snapshot.version}.')
+            details = None
+    return details if details is not None else empty_case_details_df()
+
+
+def build_stats(snapshot):
+    if snapshot._stats_df is not None:
+        return snapshot._stats_df
+    return calculate_stats(snapshot.cases_df, snapshot.breakdowns())
+
+
+def fingerprint_tables(dfs):
+    digest = hashlib.sha1()
+    for df in dfs:
+        digest.update(','.join(str(col) for col in df.columns).encode('utf-8'))
+        digest.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return digest.hexdigest()
+
+
+def build_layout_options(snapshot):
+    """Precompute the dropdown values and slider range used by the layout.
+
+    The result is JSON serialisable so it can be stored next to the snapshot
+    and read back at start-up without touching the DataFrames.
+
+    """
+    cases_df = snapshot.cases_df
+    districts = snapshot.districts().districts
+    return {
+        'case_value': int(cases_df['case_no'].max()) if not cases_df.empty else None,
+        'districts': districts,
+        'max_wait': int(snapshot.hospital_awaiting_df['topWait_value'].max()),
+    }
+
+
+_current_snapshot = None
+_publish_lock = threading.Lock()
+# Notified on every publish, see wait_for_snapshot()
+_published = threading.Condition(_publish_lock)
+
+
+def publish_snapshot(snapshot):
+    """Make the snapshot the one returned by get_snapshot()
+
+    """
+    global _current_snapshot
+    with _publish_lock:
+        # A newer snapshot continues the lineage of the one it replaces, so that
+        # incrementally maintained artifacts only apply the differences
+        if _current_snapshot is not None and snapshot.version > _current_snapshot.version:
+            snapshot.lineage = _current_snapshot.lineage
+        _current_snapshot = snapshot
+        _published.notify_all()
+    return snapshot
+
+
+def wait_for_snapshot(version, timeout=None):
+    """Block until a snapshot with another version than version is published, or the timeout expires.
+
+    Return the latest published snapshot, which has the same version on timeout.
+
+    """
+    with _published:
+        _published.wait_for(
+            lambda: _current_snapshot is not None and _current_snapshot.version != version,
+            timeout
+        )
+        return _current_snapshot
+
+
+def get_snapshot():
+    """Return the latest published snapshot, or None if nothing is published yet.
+
+    """
+    return _current_snapshot
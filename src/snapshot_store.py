@@ -0,0 +1,275 @@
+import os
+import json
+import shutil
+try:
+    import fcntl
+except Exception as e:
+    fcntl = None
+try:
+    import pyarrow as pa
+except Exception as e:
+    pa = None
+    print(f'Unable to import pyarrow, the shared snapshot store is disabled')
+from snapshot import Snapshot
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+# The store shared by the workers, rewritten on every refresh
+store_dir = os.path.join(dir_path, '..', 'data', 'snapshot')
+# The snapshot generated from the csv files, see convert_csv_to_snapshot()
+seed_dir = os.path.join(dir_path, '..', 'data', 'seed')
+
+# Bump when the layout of the files or the table schemas change, older snapshots are then ignored
+SCHEMA_VERSION = 3
+
+TABLES = ['cases', 'high_risk', 'stats', 'hospital_awaiting']
+KEEP_VERSIONS = 2
+
+# The only high risk columns the map needs, read with read_table(..., columns=MAP_COLUMNS)
+MAP_COLUMNS = ['lat', 'lng', 'start_date', 'end_date', 'sub_district_en', 'hover_text']
+# The columns read_snapshot() converts to pandas by default: the map columns, and the ones of the
+# venues and the district names. The others (remarks, source urls, ...) are only needed to write
+# a snapshot, and stay in the mapped files. Tables not listed are read entirely.
+SERVED_COLUMNS = {
+    'high_risk': MAP_COLUMNS + ['sub_district_zh', 'location_en', 'case_no'],
+}
+# Text columns with many repeated values, written as Arrow dictionaries and read back as categoricals
+DICTIONARY_COLUMNS = {
+    'cases': ['source_url'],
+    'high_risk': ['location_en', 'location_zh', 'hover_text', 'date_range', 'case_no', 'case'],
+}
+
+
+def store_available():
+    return pa is not None
+
+
+def _to_arrow_table(df):
+    """Convert a DataFrame to an Arrow table, casting mixed object columns to str.
+
+    """
+    try:
+        return pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError):
+        df = df.copy()
+        for col in df.columns:
+            if df[col].dtype == object:
+                df[col] = df[col].where(df[col].isnull(), df[col].astype(str))
+        return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def _mappable_columns(table, df, dictionary_columns=()):
+    """Return table with its columns laid out to be read back without copies.
+
+    Missing floats and dates are Arrow nulls, and a column with nulls is
+    copied by to_pandas(). They are written as NaN and NaT values instead, so
+    the float and date columns have no nulls and are read as views of the
+    mapped file. The dictionary_columns are dictionary-encoded.
+
+    """
+    for i, field in enumerate(table.schema):
+        col = df[field.name]
+        if col.dtype == 'float64' and table.column(i).null_count:
+            array = pa.array(col.values, from_pandas=False)
+        elif col.dtype == 'datetime64[ns]' and table.column(i).null_count:
+            array = pa.array(col.values.view('int64')).cast(field.type)
+        elif field.name in dictionary_columns and pa.types.is_string(field.type):
+            array = table.column(i).dictionary_encode()
+        else:
+            continue
+        table = table.set_column(i, pa.field(field.name, array.type), array)
+    return table
+
+
+def _write_table(directory, name, df):
+    """Write df as <directory>/<name>.arrow and return its manifest entry.
+
+    """
+    table = _mappable_columns(_to_arrow_table(df), df, DICTIONARY_COLUMNS.get(name, ()))
+    with pa.OSFile(os.path.join(directory, f'{name}.arrow'), 'wb') as sink:
+        writer = pa.ipc.new_file(sink, table.schema)
+        writer.write_table(table)
+        writer.close()
+    return {'file': f'{name}.arrow', 'rows': table.num_rows, 'columns': table.schema.names}
+
+
+def read_current_version(path=store_dir):
+    """Return the version of the latest snapshot in the store, or None if the store is empty.
+
+    """
+    try:
+        with open(os.path.join(path, 'CURRENT')) as f:
+            return int(f.read().strip())
+    except (OSError, ValueError):
+        return None
+
+
+def write_snapshot(snapshot, path=store_dir):
+    """Write the snapshot as Arrow IPC files and atomically make it the current version.
+
+    Every table is written to <path>/<version>/<table>.arrow, then the CURRENT
+    file is replaced to point at the new version. Readers never see a partially
+    written snapshot.
+
+    """
+    version_dir = os.path.join(path, str(snapshot.version))
+    tmp_dir = version_dir + '.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    manifest = {
+        'schema_version': SCHEMA_VERSION,
+        'version': snapshot.version,
+        'created_at': snapshot.created_at,
+        'tables': {},
+        'load_report': snapshot.load_report,
+        'fingerprint': snapshot.fingerprint(),
+    }
+
+    for name, df in zip(TABLES, snapshot.as_tuple()):
+        manifest['tables'][name] = _write_table(tmp_dir, name, df)
+
+    # The lazy case details are a separate table, only read when a case card needs them
+    manifest['tables']['case_details'] = _write_table(tmp_dir, 'case_details', snapshot.case_details_df().reset_index())
+
+    with open(os.path.join(tmp_dir, 'layout.json'), 'w') as f:
+        json.dump(snapshot.layout_options(), f)
+
+    with open(os.path.join(tmp_dir, 'MANIFEST.json'), 'w') as f:
+        json.dump(manifest, f)
+
+    shutil.rmtree(version_dir, ignore_errors=True)
+    os.rename(tmp_dir, version_dir)
+    with open(os.path.join(path, 'CURRENT.tmp'), 'w') as f:
+        f.write(str(snapshot.version))
+    os.replace(os.path.join(path, 'CURRENT.tmp'), os.path.join(path, 'CURRENT'))
+
+    _remove_old_versions(path, snapshot.version)
+
+
+def _remove_old_versions(path, current_version):
+    versions = sorted(int(d) for d in os.listdir(path) if d.isdigit())
+    for version in versions[:-KEEP_VERSIONS]:
+        if version != current_version:
+            shutil.rmtree(os.path.join(path, str(version)), ignore_errors=True)
+
+
+def read_manifest(path=store_dir, version=None):
+    """Return the manifest of the given (default: current) version, or None if the store is empty.
+
+    Raises ValueError if the snapshot was written with another SCHEMA_VERSION.
+
+    """
+    if version is None:
+        version = read_current_version(path)
+    if version is None:
+        return None
+    with open(os.path.join(path, str(version), 'MANIFEST.json')) as f:
+        manifest = json.load(f)
+    if manifest.get('schema_version') != SCHEMA_VERSION:
+        raise ValueError(f'Snapshot {version} has schema version {manifest.get("schema_version")}, expected {SCHEMA_VERSION}')
+    return manifest
+
+
+def read_table(name, columns=None, path=store_dir, version=None):
+    """Memory-map one table of a snapshot and return it as an Arrow table, optionally projected to columns.
+
+    Reading from a memory map is zero-copy: the buffers of the columns that
+    are not selected are never paged in.
+
+    """
+    manifest = read_manifest(path, version)
+    if manifest is None:
+        return None
+    source = pa.memory_map(os.path.join(path, str(manifest['version']), manifest['tables'][name]['file']), 'r')
+    table = pa.ipc.open_file(source).read_all()
+    if columns is not None:
+        table = pa.Table.from_arrays([table.column(col) for col in columns], names=columns)
+    return table
+
+
+def read_snapshot(path=store_dir, version=None, columns=SERVED_COLUMNS):
+    """Memory-map the snapshot files of the given (default: current) version and return a Snapshot.
+
+    Only the columns of the tables given in columns (default: SERVED_COLUMNS)
+    are read. Pass columns=None for a snapshot with all of the columns, e.g.
+    to write it again.
+
+    The files are mapped from the page cache, which all workers share. The
+    float, integer and date columns are read-only views of the mapped pages
+    (see _mappable_columns()), so they are not copied per worker. Categorical
+    and dictionary columns only take their codes and one Python string per
+    distinct value, the other text columns one pointer per row. The tables
+    were written with the compact schema already applied, so they are not
+    copied again by apply_schema().
+
+    """
+    manifest = read_manifest(path, version)
+    if manifest is None:
+        return None
+    version = manifest['version']
+
+    dfs = []
+    for name in TABLES:
+        projection = (columns or {}).get(name)
+        if projection is not None:
+            projection = [col for col in projection if col in manifest['tables'][name]['columns']]
+        dfs.append(read_table(name, projection, path=path, version=version).to_pandas(split_blocks=True))
+
+    # Keep the details mapped, they are only converted to pandas when a case card first needs them
+    case_details = None
+    if 'case_details' in manifest['tables']:
+        details_table = read_table('case_details', path=path, version=version)
+        case_details = lambda: details_table.to_pandas().set_index('case_no')
+
+    snapshot = Snapshot(
+        *dfs,
+        version=version,
+        created_at=manifest['created_at'],
+        load_report=manifest.get('load_report'),
+        case_details=case_details
+    )
+
+    if 'fingerprint' in manifest:
+        snapshot.derived('fingerprint', lambda s: manifest['fingerprint'])
+
+    # Reuse the precomputed layout options instead of rebuilding them from the DataFrames
+    try:
+        with open(os.path.join(path, str(version), 'layout.json')) as f:
+            layout_options = json.load(f)
+        snapshot.derived('layout_options', lambda s: layout_options)
+    except OSError:
+        pass
+
+    return snapshot
+
+
+class StoreLock(object):
+    """Non-blocking inter-process lock, used to elect the worker that refreshes the store.
+
+    Without fcntl (e.g. on Windows) every process is considered the leader.
+
+    """
+
+    def __init__(self, path=store_dir):
+        self.path = os.path.join(path, '.lock')
+        self._file = None
+
+    def acquire(self):
+        if self._file is not None:
+            return True
+        if fcntl is None:
+            return True
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        f = open(self.path, 'a')
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            return False
+        self._file = f
+        return True
+
+    def release(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,110 @@
+import numpy as np
+from venues import build_high_risk_venues
+
+MIN_LEVEL = 8
+# From this zoom level on, the venues are returned individually instead of clustered
+MAX_LEVEL = 16
+# Width of a cluster cell on screen, in pixels
+CLUSTER_PIXELS = 40
+# From this zoom level on, only the clusters around the visible area are returned
+VIEWPORT_LEVEL = 13
+# Approximate size of the map on screen, in pixels, with a margin for panning
+VIEWPORT_PIXELS = (1600, 1000)
+
+
+def zoom_level(zoom):
+    """Return the integer clustering level for a mapbox zoom
+
+    """
+    if zoom is None:
+        return None
+    return int(min(max(np.floor(zoom), MIN_LEVEL), MAX_LEVEL))
+
+
+def cell_size(level):
+    """Size in degrees of a cluster cell at the level, using the web mercator scale at the equator
+
+    """
+    return CLUSTER_PIXELS * 360.0 / (256 * 2 ** level)
+
+
+def viewport_key(level, center):
+    """Return the viewport the clusters are restricted to, quantized so that small pans share a key
+
+    """
+    if level is None or level < VIEWPORT_LEVEL or center is None:
+        return None
+    degrees_per_pixel = 360.0 / (256 * 2 ** level)
+    half_width = VIEWPORT_PIXELS[0] * degrees_per_pixel / 2
+    half_height = VIEWPORT_PIXELS[1] * degrees_per_pixel / 2
+    # Snap the center to half a viewport, the returned bounds cover the whole viewport around it
+    lat = round(center['lat'] / half_height) * half_height
+    lon = round(center['lon'] / half_width) * half_width
+    return (lat - 2 * half_height, lat + 2 * half_height, lon - 2 * half_width, lon + 2 * half_width)
+
+
+class GridIndex(object):
+    """Per-snapshot multi-level grid over lat/lng, used to cluster the high risk markers.
+
+    For every level the points are assigned a dense cell code once, so
+    clustering a subset of the points is a bincount over their codes. The
+    number of clusters returned is bounded by the number of cells covering
+    the data (or the viewport), not by the number of points. At MAX_LEVEL
+    every point inside the viewport is its own cluster.
+
+    """
+
+    def __init__(self, lat, lng):
+        self.lat = np.asarray(lat, dtype=float)
+        self.lng = np.asarray(lng, dtype=float)
+        self.valid = ~(np.isnan(self.lat) | np.isnan(self.lng))
+        self.codes = {}
+        self.n_cells = {}
+        for level in range(MIN_LEVEL, MAX_LEVEL):
+            size = cell_size(level)
+            rows = np.floor(np.where(self.valid, self.lat, 0) / size).astype(np.int64)
+            cols = np.floor(np.where(self.valid, self.lng, 0) / size).astype(np.int64)
+            keys = rows * 1000003 + cols
+            _, codes = np.unique(keys, return_inverse=True)
+            self.codes[level] = codes
+            self.n_cells[level] = codes.max() + 1 if len(codes) else 0
+
+    def clusters(self, mask, level, viewport=None):
+        """Return (lat, lng, count, single) for the clusters of the points selected by mask.
+
+        lat and lng are the centroid of each cluster, count its number of
+        points, and single the row position of the point for the clusters of
+        one point (-1 otherwise).
+
+        """
+        mask = np.asarray(mask, dtype=bool) & self.valid
+        if viewport is not None:
+            lat_min, lat_max, lng_min, lng_max = viewport
+            mask &= (self.lat >= lat_min) & (self.lat <= lat_max) & (self.lng >= lng_min) & (self.lng <= lng_max)
+
+        positions = np.flatnonzero(mask)
+        if level >= MAX_LEVEL:
+            # Fully zoomed in, so that clustered venues can always be told apart
+            return self.lat[positions], self.lng[positions], np.ones(len(positions), dtype=np.int64), positions
+
+        codes = self.codes[level][positions]
+        n_cells = self.n_cells[level]
+        count = np.bincount(codes, minlength=n_cells)
+        lat_sum = np.bincount(codes, weights=self.lat[positions], minlength=n_cells)
+        lng_sum = np.bincount(codes, weights=self.lng[positions], minlength=n_cells)
+
+        occupied = np.flatnonzero(count)
+        single = np.full(n_cells, -1, dtype=np.int64)
+        is_single = count[codes] == 1
+        single[codes[is_single]] = positions[is_single]
+
+        count = count[occupied]
+        return lat_sum[occupied] / count, lng_sum[occupied] / count, count, single[occupied]
+
+
+def build_grid_index(snapshot):
+    """Grid over the high risk venues, one point per venue rather than per record
+
+    """
+    venues_df = snapshot.derived('high_risk_venues', build_high_risk_venues).venues_df
+    return GridIndex(venues_df['lat'].values, venues_df['lng'].values)
@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+
+# Records without a location name are grouped on their coordinates, rounded to about 10 meters
+COORDINATE_DECIMALS = 4
+
+
+def venue_keys(high_risk_df):
+    """Return the venue key of every high risk record: its location and district, or its rounded coordinates
+
+    """
+    location = high_risk_df['location_en'].astype(object).fillna('').str.strip().str.lower()
+    district = high_risk_df['sub_district_en'].astype(object).fillna('')
+    coordinates = (
+        high_risk_df['lat'].round(COORDINATE_DECIMALS).astype(str) + ',' +
+        high_risk_df['lng'].round(COORDINATE_DECIMALS).astype(str)
+    )
+    return np.where(location != '', location + '|' + district, coordinates)
+
+
+class HighRiskVenues(object):
+    """The high risk records aggregated to one row per venue.
+
+    high_risk_df has one row per case and location, so the same building is
+    listed once for every case that visited it. venues_df has one row per
+    venue, with the case numbers combined and the date span covering all of
+    its records. codes maps every record to the row of its venue, so a mask
+    over the records is reduced to a mask over the venues with one bincount.
+
+    """
+
+    def __init__(self, high_risk_df):
+        codes, _ = pd.factorize(venue_keys(high_risk_df))
+        self.codes = codes
+        self.size = int(codes.max()) + 1 if len(codes) else 0
+
+        grouped = high_risk_df.assign(venue=codes).groupby('venue', sort=True)
+        venues_df = pd.DataFrame({
+            'location_en': grouped['location_en'].first().astype(object),
+            'sub_district_en': grouped['sub_district_en'].first().astype(object),
+            'lat': grouped['lat'].mean(),
+            'lng': grouped['lng'].mean(),
+            'start_date': grouped['start_date'].min(),
+            'end_date': grouped['end_date'].max(),
+            'n_records': grouped.size(),
+        })
+
+        case_nos = high_risk_df['case_no'].astype(object).where(high_risk_df['case_no'].notnull(), None)
+        cases = pd.DataFrame({'venue': codes, 'case_no': case_nos}).dropna().drop_duplicates()
+        cases['order'] = pd.to_numeric(cases['case_no'], errors='coerce')
+        cases = cases.sort_values(['venue', 'order'])
+        venues_df['cases'] = cases.groupby('venue')['case_no'].agg(', '.join).reindex(venues_df.index).fillna('')
+
+        date_range = (
+            venues_df['start_date'].dt.strftime('%Y-%m-%d').fillna('') + ' - ' +
+            venues_df['end_date'].dt.strftime('%Y-%m-%d').fillna('')
+        )
+        venues_df['hover_text'] = (
+            venues_df['location_en'].fillna('') + '<br>' +
+            venues_df['sub_district_en'].fillna('') + '<br>' +
+            date_range + '<br>' +
+            'Cases: ' + venues_df['cases']
+        )
+        self.venues_df = venues_df.reset_index(drop=True)
+
+    def mask(self, record_mask):
+        """Return the mask of the venues with at least one record selected by record_mask
+
+        """
+        selected = np.bincount(self.codes, weights=np.asarray(record_mask, dtype=float), minlength=self.size)
+        return selected > 0
+
+
+def build_high_risk_venues(snapshot):
+    return HighRiskVenues(snapshot.high_risk_df)
@@ -7,80 +7,272 @@ Created on Mon Feb  3 12:50:18 2020
 
 from lxml import html
 import requests
+from requests.adapters import HTTPAdapter
 import pandas as pd
 import numpy as np
 import re
 from bs4 import BeautifulSoup
+import io
 import json
+import hashlib
+import threading
+from decimal import Decimal
+try:
+    import ijson.backends.yajl2_c as ijson
+except Exception as e:
+    try:
+        import ijson
+    except Exception as e:
+        ijson = None
+        print(f'Unable to import ijson, parsing the feeds with json.loads')
 
 hk_latitude, hk_longitude = 22.2793278, 114.1628131
 
-def fetch_highrisk():
+# (connect, read) timeouts in seconds for the requests to wars.vote4.hk
+REQUEST_TIMEOUT = (5, 15)
+
+_session = None
+
+def get_session():
     """
-    Returns a DataFrame that contains the high risk area information.
-    
+    Returns the requests.Session shared by all fetch functions.
+
+    The session keeps the connections to wars.vote4.hk alive, so they are
+    reused by the concurrent fetches and across refresh cycles.
+
     """
-    page = requests.get('https://wars.vote4.hk/page-data/en/high-risk/page-data.json')
-    data = json.loads(page.content)
-    cases = data['result']['data']['allWarsCaseLocation']['edges']
-    
-    res = []
-    
-    for case in cases:
-        res.append(case['node'])
+    global _session
+    if _session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=8)
+        session.mount('https://', adapter)
+        _session = session
+    return _session
+
+HIGH_RISK_URL = 'https://wars.vote4.hk/page-data/en/high-risk/page-data.json'
+CASES_URL = 'https://wars.vote4.hk/page-data/en/cases/page-data.json'
+AWAITING_URL = 'https://wars.vote4.hk/page-data/en/ae-waiting-time/page-data.json'
+
+# For every feed url: the ETag / Last-Modified validators, the hash of the
+# last body, the fingerprint of every node and the resulting DataFrame.
+_feed_cache = {}
+# One lock per feed url, held by the fetch functions while they read and update its cache. A fetch
+# abandoned by load_data_with_report() keeps running, the next fetch of the feed waits for it.
+_feed_locks = {url: threading.Lock() for url in [HIGH_RISK_URL, CASES_URL, AWAITING_URL]}
+
+def fetch_page_data(url, session=None):
+    """
+    Returns (content, validators): the raw page-data json of the url, or None if it is unchanged since the last call.
+
+    The request is conditional (If-None-Match / If-Modified-Since), so an
+    unchanged feed costs a 304. If the server ignores the validators, the
+    body is hashed and compared to the previous one before parsing.
+
+    The validators of a new body are only stored by store_validators() once
+    it was parsed, so a body that failed to parse is parsed again next time.
+
+    """
+    cache = _feed_cache.setdefault(url, {})
+    headers = {}
+    # Only send validators once a DataFrame was built, otherwise a 304 would leave us with nothing
+    if 'df' in cache:
+        if cache.get('etag'):
+            headers['If-None-Match'] = cache['etag']
+        if cache.get('last_modified'):
+            headers['If-Modified-Since'] = cache['last_modified']
+
+    page = (session or get_session()).get(url, headers=headers, timeout=REQUEST_TIMEOUT)
+    if page.status_code == 304 and 'df' in cache:
+        return None, None
+    page.raise_for_status()
+
+    validators = {
+        'etag': page.headers.get('ETag'),
+        'last_modified': page.headers.get('Last-Modified'),
+        'content_hash': hashlib.sha1(page.content).hexdigest(),
+    }
+    if validators['content_hash'] == cache.get('content_hash') and 'df' in cache:
+        # Same body as the one the DataFrame was built from
+        cache.update(validators)
+        return None, None
+
+    return page.content, validators
+
+def store_validators(url, validators):
+    """
+    Stores the validators returned by fetch_page_data(), once the DataFrame of the content is built.
+
+    """
+    _feed_cache[url].update(validators)
+
+# Columns kept from every node of the feeds, and converters applied while parsing
+HIGH_RISK_COLUMNS = [
+    'id', 'sub_district_zh', 'sub_district_en', 'action_zh', 'action_en', 'location_en', 'location_zh',
+    'remarks_en', 'remarks_zh', 'source_url_1', 'source_url_2', 'start_date', 'end_date', 'lat', 'lng',
+    'type', 'case_no', 'case',
+]
+HIGH_RISK_CONVERTERS = {
+    'lat': lambda v: float(v) if v not in (None, '') else np.nan,
+    'lng': lambda v: float(v) if v not in (None, '') else np.nan,
+    'case': lambda d: d['case_no'] if type(d) == dict else '',
+}
+CASES_COLUMNS = [
+    'case_no', 'onset_date', 'confirmation_date', 'gender', 'age', 'hospital_zh', 'hospital_en', 'status',
+    'status_zh', 'status_en', 'type_zh', 'type_en', 'citizenship_zh', 'citizenship_en', 'detail_zh',
+    'detail_en', 'classification', 'classification_zh', 'classification_en', 'source_url',
+]
+CASES_CONVERTERS = {
+    'case_no': int,
+}
+AWAITING_COLUMNS = [
+    'name_zh', 'name_en', 'hospCode', 'hospTimeEn', 'topWait', 'district_zh', 'district_en',
+    'sub_district_zh', 'sub_district_en',
+]
+
+def iter_nodes(content, connection):
+    """
+    Yields the result.data.<connection>.edges[].node objects of a page-data json one at a time.
+
+    With ijson the document is parsed as a stream, so only one node is held in
+    memory at a time instead of the whole dictionary tree.
+
+    """
+    if ijson is None:
+        for edge in json.loads(content)['result']['data'][connection]['edges']:
+            yield edge['node']
+    else:
+        for node in ijson.items(io.BytesIO(content), f'result.data.{connection}.edges.item.node'):
+            yield node
+
+def append_node(buffers, node, columns, converters):
+    """
+    Appends the values of the given columns of one node to the column buffers.
 
-    ## Change the 'case' column to one that uses string instead of dictionary
-    high_risk_df = pd.DataFrame(res)
-    high_risk_df['case'] = high_risk_df['case'].apply(lambda d: d['case_no'] if type(d) == dict else '')
+    """
+    for col in columns:
+        value = node.get(col)
+        if col in converters:
+            value = converters[col](value)
+        elif isinstance(value, Decimal):
+            # ijson returns json numbers as Decimal
+            value = int(value) if value == value.to_integral_value() else float(value)
+        buffers[col].append(value)
+
+def fill_columns(nodes, columns, converters=None):
+    """
+    Returns a dictionary of column name to list of values, only keeping the given columns.
+
+    """
+    converters = converters or {}
+    buffers = {col: [] for col in columns}
+    for node in nodes:
+        append_node(buffers, node, columns, converters)
+    return buffers
+
+def merge_nodes(url, nodes, key, columns, converters, build_df):
+    """
+    Returns the DataFrame of the feed, only building the rows of new or changed nodes.
+
+    The nodes are matched to the previous call by their key ('case_no' or 'id')
+    and compared on the kept columns. Rows of unchanged nodes are reused from
+    the previous DataFrame, rows of nodes that are gone are dropped. The
+    values of new or changed nodes are appended to the column buffers while
+    the feed is streamed, so no node is kept once it was read.
+
+    """
+    cache = _feed_cache.setdefault(url, {})
+    previous_fingerprints = cache.get('fingerprints', {})
+    previous_df = cache.get('df')
+
+    fingerprints = {}
+    buffers = {col: [] for col in columns}
+    n_changed = 0
+    for node in nodes:
+        node_key = str(node[key])
+        values = [node.get(col) for col in columns]
+        fingerprint = hashlib.sha1(json.dumps(values, default=str).encode('utf-8')).digest()
+        fingerprints[node_key] = fingerprint
+        if previous_fingerprints.get(node_key) != fingerprint:
+            append_node(buffers, node, columns, converters)
+            n_changed += 1
+
+    if previous_df is None:
+        df = build_df(buffers)
+    else:
+        kept_keys = set(k for k, f in fingerprints.items() if previous_fingerprints.get(k) == f)
+        kept_df = previous_df[previous_df[key].astype(str).isin(kept_keys)]
+        if n_changed:
+            changed_df = build_df(buffers)
+            df = pd.concat([kept_df, changed_df], ignore_index=True, sort=False)
+        else:
+            df = kept_df.reset_index(drop=True)
+
+    cache['fingerprints'] = fingerprints
+    cache['df'] = df
+    return df
+
+def _build_highrisk_df(columns):
+    high_risk_df = pd.DataFrame(columns)
     # temp correct data source error
     high_risk_df['start_date'] = high_risk_df['start_date'].replace('0220-02-24', '2020-02-24')
     high_risk_df['start_date'] = high_risk_df['start_date'].replace('0220-03-24', '2020-03-24')
     # temp correction end
     high_risk_df['start_date'] = pd.to_datetime(high_risk_df['start_date'].replace('Invalid date', None), format='%Y-%m-%d')
     high_risk_df['end_date'] = pd.to_datetime(high_risk_df['end_date'].replace('Invalid date', None), format='%Y-%m-%d')
-
     return high_risk_df
 
-def fetch_cases():
+def _build_cases_df(columns):
+    return pd.DataFrame(columns)
+
+def fetch_highrisk(session=None):
+    """
+    Returns a DataFrame that contains the high risk area information.
+    
+    """
+    with _feed_locks[HIGH_RISK_URL]:
+        content, validators = fetch_page_data(HIGH_RISK_URL, session)
+        if content is None:
+            return _feed_cache[HIGH_RISK_URL]['df']
+
+        nodes = iter_nodes(content, 'allWarsCaseLocation')
+        high_risk_df = merge_nodes(HIGH_RISK_URL, nodes, 'id', HIGH_RISK_COLUMNS, HIGH_RISK_CONVERTERS, _build_highrisk_df)
+        store_validators(HIGH_RISK_URL, validators)
+        return high_risk_df
+
+def fetch_cases(session=None):
     """
     Returns a DataFrame that contains the confirmed cases information.
 
     """
-   
-    page = requests.get('https://wars.vote4.hk/page-data/en/cases/page-data.json')
-    data = json.loads(page.content)
-    cases = data['result']['data']['allWarsCase']['edges']
-    
-    res = []
-    
-    for case in cases:
-        res.append(case['node'])
-    
-    cases_df = pd.DataFrame(res)
-    cases_df['case_no'] = cases_df['case_no'].astype(int)
-    cases_df = cases_df.sort_values(by='case_no', ascending=False)
+    with _feed_locks[CASES_URL]:
+        content, validators = fetch_page_data(CASES_URL, session)
+        if content is None:
+            return _feed_cache[CASES_URL]['sorted_df']
 
-    return cases_df
-    
-def fetch_awaiting_time():
+        nodes = iter_nodes(content, 'allWarsCase')
+        cases_df = merge_nodes(CASES_URL, nodes, 'case_no', CASES_COLUMNS, CASES_CONVERTERS, _build_cases_df)
+        cases_df = cases_df.sort_values(by='case_no', ascending=False)
+        _feed_cache[CASES_URL]['sorted_df'] = cases_df
+        store_validators(CASES_URL, validators)
+
+        return cases_df
+
+def fetch_awaiting_time(session=None):
     """ 
     Return a list of dictionary that contains the hospital awaiting time.
     
     """
-    page = requests.get('https://wars.vote4.hk/page-data/en/ae-waiting-time/page-data.json')
-    data = json.loads(page.content)
-    cases = data['result']['data']['allAeWaitingTime']['edges']
-    
-    res = []
-    
-    for case in cases:
-        res.append(case['node'])
-    
-    awaiting_df = pd.DataFrame(res)
+    with _feed_locks[AWAITING_URL]:
+        content, validators = fetch_page_data(AWAITING_URL, session)
+        if content is None:
+            return _feed_cache[AWAITING_URL]['df']
 
-    # Add column 'topWait_value' that will be used in hte slide bar to display hospitals of a particular waiting time group
-    replace_dict = {f'> {i}': i for i in np.arange(1, 24)}
-    replace_dict['< 1'] = 0
-    awaiting_df['topWait_value'] = awaiting_df['topWait'].replace(replace_dict)
-    return awaiting_df
+        awaiting_df = pd.DataFrame(fill_columns(iter_nodes(content, 'allAeWaitingTime'), AWAITING_COLUMNS))
 
+        # Add column 'topWait_value' that will be used in hte slide bar to display hospitals of a particular waiting time group
+        replace_dict = {f'> {i}': i for i in np.arange(1, 24)}
+        replace_dict['< 1'] = 0
+        awaiting_df['topWait_value'] = awaiting_df['topWait'].replace(replace_dict)
+        _feed_cache[AWAITING_URL]['df'] = awaiting_df
+        store_validators(AWAITING_URL, validators)
+        return awaiting_df
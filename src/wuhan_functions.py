@@ -5,34 +5,216 @@ except Exception as e:
     print(f'Unable to import pyodbc')
 from geopy.geocoders import Nominatim
 import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 import pickle
 import pandas as pd
-from webscraper import fetch_highrisk, fetch_cases, fetch_awaiting_time
+from webscraper import fetch_highrisk, fetch_cases, fetch_awaiting_time, get_session
 
 dir_path = os.path.dirname(os.path.realpath(__file__))
 data_dir = os.path.join(dir_path, '..', 'data') 
 
-def calculate_stats(cases_df):
-    """Calcualte the basic statistics based on the information from cases_df
+#######################################
+### Compact in-memory schema, applied by every loader
+#######################################
+
+# 'category' for the low-cardinality text, 'Int64' for nullable integers,
+# 'date' for real datetimes, 'str' for free text and 'lazy' for the large
+# text columns that are kept out of cases_df, see Snapshot.case_details().
+# The boolean 'asymptomatic' column is derived from onset_date, see apply_cases_schema().
+CASES_SCHEMA = {
+    'case_no': 'int',
+    'onset_date': 'date',
+    'confirmation_date': 'date',
+    'gender': 'category',
+    'age': 'Int64',
+    'hospital_zh': 'category',
+    'hospital_en': 'category',
+    'status': 'category',
+    'status_zh': 'category',
+    'status_en': 'category',
+    'type_zh': 'category',
+    'type_en': 'category',
+    'citizenship_zh': 'category',
+    'citizenship_en': 'category',
+    'detail_zh': 'lazy',
+    'detail_en': 'lazy',
+    'classification': 'category',
+    'classification_zh': 'category',
+    'classification_en': 'category',
+    'source_url': 'str',
+}
+
+HIGH_RISK_SCHEMA = {
+    'id': 'str',
+    'sub_district_zh': 'category',
+    'sub_district_en': 'category',
+    'action_zh': 'category',
+    'action_en': 'category',
+    'location_en': 'str',
+    'location_zh': 'str',
+    'remarks_en': 'str',
+    'remarks_zh': 'str',
+    'source_url_1': 'str',
+    'source_url_2': 'str',
+    'start_date': 'date',
+    'end_date': 'date',
+    'lat': 'float',
+    'lng': 'float',
+    'type': 'category',
+    'case_no': 'str',
+    'case': 'str',
+}
+
+def lazy_columns(schema):
+    return [col for col, kind in schema.items() if kind == 'lazy']
+
+def apply_schema(df, schema):
+    """Return a copy of df with the compact dtypes of the schema, the lazy columns are left as they are
+
+    Applying the schema twice gives the same result, so it is safe to apply it
+    to data that was already converted (e.g. read back from a snapshot).
+
+    """
+    df = df.copy()
+    for col, kind in schema.items():
+        if col not in df.columns:
+            continue
+        if kind == 'category':
+            df[col] = df[col].astype('category')
+        elif kind == 'date':
+            if not pd.api.types.is_datetime64_any_dtype(df[col]):
+                df[col] = pd.to_datetime(df[col], format='%Y-%m-%d', errors='coerce')
+        elif kind == 'Int64':
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype('Int64')
+        elif kind == 'int':
+            df[col] = df[col].astype(int)
+        elif kind == 'float':
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype(float)
+        elif kind == 'str':
+            df[col] = df[col].where(df[col].isnull(), df[col].astype(str)).astype(object)
+    return df
+
+def apply_cases_schema(cases_df):
+    """Apply CASES_SCHEMA. The lazy detail columns are split off when the Snapshot is built
+
+    The onset_date of an asymptomatic case is 'asymptomatic' instead of a date.
+    It is kept as the asymptomatic column before onset_date becomes NaT, so that
+    it is not confused with the cases without a known onset ('none').
+
+    """
+    if 'asymptomatic' not in cases_df.columns and 'onset_date' in cases_df.columns:
+        cases_df = cases_df.assign(asymptomatic=cases_df['onset_date'].astype(str).str.lower() == 'asymptomatic')
+    return apply_schema(cases_df, CASES_SCHEMA)
+
+def apply_high_risk_schema(high_risk_df):
+    return apply_schema(high_risk_df, HIGH_RISK_SCHEMA)
+
+#######################################
+### Lazily loaded case details
+#######################################
+
+def split_case_details(cases_df):
+    """Return cases_df without its lazy columns, and the lazy columns as a DataFrame indexed by case_no
+
+    The details are None when cases_df has none of the lazy columns.
 
     """
+    lazy = [col for col in lazy_columns(CASES_SCHEMA) if col in cases_df.columns]
+    if not lazy:
+        return cases_df, None
+    details_df = cases_df[['case_no'] + lazy].astype({'case_no': int}).set_index('case_no')
+    return cases_df.drop(columns=lazy), details_df.reindex(columns=lazy_columns(CASES_SCHEMA))
 
-    death = (cases_df['status_en'] == 'Deceased').sum()
-    confirmed = cases_df.shape[0]
-    discharged = (cases_df['status_en'] == 'Discharged').sum()
-    hospitalised = (cases_df['status_en'] == 'Hospitalised').sum()
+def empty_case_details_df():
+    return pd.DataFrame(columns=lazy_columns(CASES_SCHEMA), index=pd.Index([], dtype=int, name='case_no'))
+
+def get_case_details(details_df, case_no):
+    """Return a dictionary of the lazy columns of a case, with empty strings when unknown
+
+    """
+    try:
+        row = details_df.loc[case_no]
+    except KeyError:
+        return {col: '' for col in lazy_columns(CASES_SCHEMA)}
+    return {col: ('' if pd.isnull(row[col]) else row[col]) for col in lazy_columns(CASES_SCHEMA)}
+
+def calculate_stats(cases_df, breakdowns=None):
+    """Calcualte the basic statistics based on the information from cases_df
+
+    The status counts are the 'status' breakdown of calculate_breakdowns(). The
+    Snapshot passes its memoized breakdowns, so the statuses are counted once.
+
+    """
+    if breakdowns is None:
+        breakdowns = calculate_breakdowns(cases_df)
+    status_counts = breakdowns['status']
 
     df = pd.DataFrame(
         data={
-            'death': death,
-            'confirmed': confirmed,
-            'discharged': discharged,
-            'hospitalised': hospitalised
+            'death': int(status_counts.get('Deceased', 0)),
+            'confirmed': cases_df.shape[0],
+            'discharged': int(status_counts.get('Discharged', 0)),
+            'hospitalised': int(status_counts.get('Hospitalised', 0))
         },
         index=[0]
     )
     return df
 
+AGE_BANDS = [0, 10, 20, 30, 40, 50, 60, 70, 80, 200]
+AGE_BAND_LABELS = ['0-9', '10-19', '20-29', '30-39', '40-49', '50-59', '60-69', '70-79', '80+']
+
+def calculate_breakdowns(cases_df):
+    """Return the number of cases by status, classification, type, age band and confirmation date
+
+    Every breakdown is a Series of counts, computed with one grouping pass per
+    column (on the categorical codes for the categorical columns).
+
+    """
+    age_bands = pd.cut(
+        cases_df['age'].astype(float),
+        bins=AGE_BANDS,
+        right=False,
+        labels=AGE_BAND_LABELS
+    )
+    return {
+        'status': cases_df['status_en'].value_counts(),
+        'classification': cases_df['classification_en'].value_counts(),
+        'type': cases_df['type_en'].value_counts(),
+        'age_band': age_bands.value_counts().sort_index(),
+        'confirmation_date': cases_df.groupby('confirmation_date').size(),
+    }
+
+def enrich_high_risk(high_risk_df):
+    """Add the display columns of the high risk areas, so the map does not rebuild them per request
+
+    """
+    high_risk_df = high_risk_df.copy()
+    high_risk_df['date_range'] = (
+        high_risk_df['start_date'].dt.strftime('%Y-%m-%d') + ' - ' + high_risk_df['end_date'].dt.strftime('%Y-%m-%d')
+    )
+    high_risk_df['hover_text'] = (
+        high_risk_df['location_en'].astype(object) + '<br>' +
+        high_risk_df['sub_district_en'].astype(object) + '<br>' +
+        high_risk_df['date_range']
+    )
+    return high_risk_df
+
+def enrich_hospital_awaiting(hospital_awaiting_df):
+    """Add the display columns of the hospitals, so the map does not rebuild them per request
+
+    """
+    hospital_awaiting_df = hospital_awaiting_df.copy()
+    hospital_awaiting_df['hover_text'] = (
+        '<b>' + hospital_awaiting_df['address'] + '</b><br>Waiting time: ' + hospital_awaiting_df['topWait'] + ' hours'
+    )
+    return hospital_awaiting_df
+
+def enrich_data(cases_df, high_risk_df, stats_df, hospital_awaiting_df):
+    """Apply the load-time enrichment to the tables returned by any of the load_data_* functions
+
+    """
+    return cases_df, enrich_high_risk(high_risk_df), stats_df, enrich_hospital_awaiting(hospital_awaiting_df)
+
 def load_address_csv(path=os.path.join(data_dir, 'ADDRESS.tsv')):
     address_df = pd.read_csv(
         path, 
@@ -71,63 +253,21 @@ def load_awaiting_csv(path=os.path.join(data_dir, 'AWAITING.tsv')):
 def load_cases_csv(path=os.path.join(data_dir, 'CASES.tsv')):
     cases_df = pd.read_csv(
         path,
-        dtype={
-            'case_no': int,
-            'onset_date': str,
-            'confirmation_date': str,
-            'gender': str,
-            'age': int,
-            'hospital_zh': str,
-            'hospital_en': str,
-            'status': str,
-            'status_zh': str,
-            'status_en': str,
-            'type_zh': str,
-            'type_en': str,
-            'citizenship_zh': str,
-            'citizenship_en': str,
-            'detail_zh': str,
-            'detail_en': str,
-            'classification': str,
-            'classification_zh': str,
-            'classification_en': str,
-            'source_url': str,
-        },
+        dtype=str,
+        usecols=list(CASES_SCHEMA),
         sep='\t'
     )
 
-    return cases_df
+    return apply_cases_schema(cases_df)
 
 def load_high_risk_csv(path=os.path.join(data_dir, 'HIGH_RISK.tsv')):
     high_risk_df = pd.read_csv(
         path,
-        dtype={
-            'action_en': str,
-            'action_zh': str,
-            'case': str,
-            'case_no': str,
-            'end_date': str,
-            'id': str,
-            'lat': float,
-            'lng': float,
-            'location_en': str,
-            'location_zh': str,
-            'remarks_en': str,
-            'remarks_zh': str,
-            'source_url_1': str,
-            'source_url_2': str,
-            'start_date': str,
-            'sub_district_en': str,
-            'sub_district_zh': str,
-            'type': str,
-        },
+        dtype={col: str for col, kind in HIGH_RISK_SCHEMA.items() if kind != 'float'},
         sep='\t'
     )
 
-    high_risk_df['end_date'] = pd.to_datetime(high_risk_df['end_date'], format='%Y-%m-%d')
-    high_risk_df['start_date'] = pd.to_datetime(high_risk_df['start_date'], format='%Y-%m-%d')
-
-    return high_risk_df
+    return apply_high_risk_schema(high_risk_df)
 
 def load_hospitals_csv(path=os.path.join(data_dir, 'HOSPITALS.tsv')):
     hospital_df = pd.read_csv(
@@ -166,10 +306,66 @@ def load_data_csv():
     cases_df = load_cases_csv()
     high_risk_df = load_high_risk_csv()
     hospital_awaiting_df = load_hospital_awaiting_csv()
-    stats_df = calculate_stats(cases_df)
-    return cases_df, high_risk_df, stats_df, hospital_awaiting_df
+    return cases_df, high_risk_df, None, hospital_awaiting_df
+
+def convert_csv_to_snapshot():
+    """Write the csv data as the seed snapshot (data/seed), the local fallback of load_data()
+
+    """
+    from snapshot import Snapshot
+    from snapshot_store import write_snapshot, seed_dir
+    write_snapshot(Snapshot(*enrich_data(*load_data_csv()), version=0), seed_dir)
+
+def write_seed_snapshot(data):
+    """Write data, as returned by load_data_csv(), as the seed snapshot if there is none yet
+
+    The seed is not part of the repository, so it is written by the first
+    process that falls back to the csv files; the next starts read it instead.
+    Only the process holding the lock of the seed directory writes it.
+
+    """
+    from snapshot import Snapshot
+    from snapshot_store import write_snapshot, read_current_version, store_available, seed_dir, StoreLock
+    if not store_available() or read_current_version(seed_dir) is not None:
+        return
+    lock = StoreLock(seed_dir)
+    if not lock.acquire():
+        return
+    try:
+        if read_current_version(seed_dir) is None:
+            write_snapshot(Snapshot(*enrich_data(*data), version=0), seed_dir)
+            print(f'Wrote the seed snapshot to {seed_dir}')
+    except Exception as e:
+        print(e)
+        print(f'Unable to write the seed snapshot.')
+    finally:
+        lock.release()
+
+def load_data_csv_seeding():
+    """load_data_csv(), writing the seed snapshot if there is none yet
+
+    """
+    data = load_data_csv()
+    write_seed_snapshot(data)
+    return data
+
+def load_data_snapshot():
+    """Load the seed snapshot written by convert_csv_to_snapshot() or write_seed_snapshot()
+
+    """
+    from snapshot_store import read_snapshot, seed_dir
+    # All of the columns, the snapshot may be written to the store again
+    snapshot = read_snapshot(seed_dir, columns=None)
+    if snapshot is None:
+        raise FileNotFoundError(f'No snapshot found in {seed_dir}')
+    # The details go back into cases_df, the Snapshot built from this data splits them off again
+    cases_df = snapshot.cases_df.join(snapshot.case_details_df(), on='case_no')
+    return (cases_df,) + snapshot.as_tuple()[1:]
 
 def convert_csv_to_pickle():
+    """ (Deprecated) Replaced by convert_csv_to_snapshot()
+
+    """
     cases_df = load_cases_csv()
     high_risk_df = load_high_risk_csv()
     hospital_df = load_hospitals_csv()
@@ -187,6 +383,9 @@ def convert_csv_to_pickle():
 
 
 def load_data_pkl():
+    """ (Deprecated) Replaced by load_data_snapshot()
+
+    """
     with open(os.path.join(data_dir, 'AWAITING.pkl'), 'rb') as f:
         awaiting_df = pickle.load(f)
     with open(os.path.join(data_dir, 'CASES.pkl'), 'rb') as f:
@@ -196,7 +395,8 @@ def load_data_pkl():
     with open(os.path.join(data_dir, 'HOSPITALS.pkl'), 'rb') as f:
         hospital_df = pickle.load(f)
 
-    stats_df = calculate_stats(cases_df)
+    cases_df = apply_cases_schema(cases_df)
+    high_risk_df = apply_high_risk_schema(high_risk_df)
 
     hospital_awaiting_df = pd.merge(
         hospital_df[['address', 'latitude', 'longitude']],
@@ -206,7 +406,11 @@ def load_data_pkl():
         right_on='name_en'
     )
 
-    return cases_df, high_risk_df, stats_df, hospital_awaiting_df
+    return cases_df, high_risk_df, None, hospital_awaiting_df
+
+# Seconds allowed to log in, and to run each query, on the SQL server
+SQL_LOGIN_TIMEOUT = 10
+SQL_QUERY_TIMEOUT = 30
 
 def load_data_sql():
     server = 'datavisualizationfti.database.windows.net'
@@ -215,44 +419,21 @@ def load_data_sql():
     password = 'Pass7890'
     driver = 'SQL Server'   
     
-    cnxn = pyodbc.connect('DRIVER={' + driver + '};SERVER='+server+';DATABASE='+database+';UID='+username+';PWD='+ password)
-    
-    cases_df = pd.read_sql('SELECT * FROM CASES', cnxn)
-    high_risk_df = pd.read_sql('SELECT * FROM HIGH_RISK', cnxn)
-    hospital_df = pd.read_sql('SELECT * FROM HOSPITALS', cnxn)
-    awaiting_df = pd.read_sql('SELECT * FROM AWAITING', cnxn)
-    
-    cnxn.close()
+    cnxn = pyodbc.connect('DRIVER={' + driver + '};SERVER='+server+';DATABASE='+database+';UID='+username+';PWD='+ password, timeout=SQL_LOGIN_TIMEOUT)
+    # The login timeout does not apply to the queries, a stalled query would hold its loader thread forever
+    cnxn.timeout = SQL_QUERY_TIMEOUT
     
-    cases_df = cases_df.astype(
-        {
-            'case_no': int,
-            'onset_date': str,
-            'confirmation_date': str,
-            'gender': str,
-            'age': int,
-            'hospital_zh': str,
-            'hospital_en': str,
-            'status': str,
-            'status_zh': str,
-            'status_en': str,
-            'type_zh': str,
-            'type_en': str,
-            'citizenship_zh': str,
-            'citizenship_en': str,
-            'detail_zh': str,
-            'detail_en': str,
-            'classification': str,
-            'classification_zh': str,
-            'classification_en': str,
-            'source_url': str,
-        }
-    )
+    try:
+        cases_df = pd.read_sql('SELECT * FROM CASES', cnxn)
+        high_risk_df = pd.read_sql('SELECT * FROM HIGH_RISK', cnxn)
+        hospital_df = pd.read_sql('SELECT * FROM HOSPITALS', cnxn)
+        awaiting_df = pd.read_sql('SELECT * FROM AWAITING', cnxn)
+    finally:
+        cnxn.close()
     
-    high_risk_df['lat'] = pd.to_numeric(high_risk_df['lat'])
-    high_risk_df['lng'] = pd.to_numeric(high_risk_df['lng'])
-    high_risk_df['start_date'] = pd.to_datetime(high_risk_df['start_date'].replace('Invalid date', None), format='%Y-%m-%d')
-    high_risk_df['end_date'] = pd.to_datetime(high_risk_df['end_date'].replace('Invalid date', None), format='%Y-%m-%d')
+    cases_df = apply_cases_schema(cases_df)
+    # 'Invalid date' is coerced to NaT by the schema
+    high_risk_df = apply_high_risk_schema(high_risk_df)
     
     hospital_df = hospital_df.astype(
         {
@@ -287,20 +468,19 @@ def load_data_sql():
         right_on='name_en'
     )
     
-    stats_df = calculate_stats(cases_df)
-    
-    return cases_df, high_risk_df, stats_df, hospital_awaiting_df
+    return cases_df, high_risk_df, None, hospital_awaiting_df
 
 def load_data_live():
-    awaiting_df = fetch_awaiting_time()
-    cases_df = fetch_cases()
-    high_risk_df = fetch_highrisk()
-    try:
-        with open(os.path.join(data_dir, 'HOSPITALS.pkl'), 'rb') as f:
-            hospital_df = pickle.load(f)
-    except Exception as e:
-        hospital_df = load_hospitals_csv()
-    stats_df = calculate_stats(cases_df)
+    # The three feeds are independent, fetch them concurrently over the shared session
+    session = get_session()
+    with ThreadPoolExecutor(max_workers=3, thread_name_prefix='fetch') as executor:
+        awaiting_future = executor.submit(fetch_awaiting_time, session)
+        cases_future = executor.submit(fetch_cases, session)
+        high_risk_future = executor.submit(fetch_highrisk, session)
+        awaiting_df = awaiting_future.result()
+        cases_df = apply_cases_schema(cases_future.result())
+        high_risk_df = apply_high_risk_schema(high_risk_future.result())
+    hospital_df = load_hospitals_csv()
 
     hospital_awaiting_df = pd.merge(
         hospital_df[['address', 'latitude', 'longitude']],
@@ -310,31 +490,129 @@ def load_data_live():
         right_on='name_en'
     )
 
-    return cases_df, high_risk_df, stats_df, hospital_awaiting_df
-
-def load_data(live=False):
-
-    if live:
-        try:
-            print('Loading live data')
-            return load_data_live()
-        except Exception as e:
-            print(e)
-            print(f'Load live data failed, switching to loading saved data')
+    return cases_df, high_risk_df, None, hospital_awaiting_df
 
+def load_data_local():
     try:
-        print('Trying to load data from SQL database.')
-        return load_data_sql()
+        print('Trying to load data from snapshot.')
+        return enrich_data(*load_data_snapshot())
     except Exception as e:
-        print(f'Loading SQL database failed, trying to load data from pkl file.')
-            
-    try:
-        print('Trying to load data from pickle file.')
-        return load_data_pkl()
-    except Exception as e:
-        print(f'Loading pickle file failed, trying to read from csv.')
-        # convert_csv_to_pickle()
+        print(f'Loading snapshot failed, trying to read from csv.')
 
     print('Trying to load data from csv.')
-    return load_data_csv()
+    return enrich_data(*load_data_csv_seeding())
+
+SOURCE_PRIORITY = ['live', 'sql', 'snapshot', 'csv']
+REMOTE_SOURCES = ['live', 'sql']
+
+# Seconds a source may take before a lower priority source is used instead.
+# None means the source is waited for (the local files are the last resort).
+SOURCE_DEADLINES = {
+    'live': 20,
+    'sql': 10,
+    'snapshot': None,
+    'csv': None,
+}
+
+SOURCE_LOADERS = {
+    'live': load_data_live,
+    'sql': load_data_sql,
+    'snapshot': load_data_snapshot,
+    'csv': load_data_csv_seeding,
+}
+
+def load_data_with_report(live=False, sources=None, deadlines=SOURCE_DEADLINES):
+    """Race the data sources and return the data of the freshest one that answers in time.
+
+    The sources are tried in the order of SOURCE_PRIORITY. A source is used as
+    soon as it has succeeded and every source with a higher priority has
+    either failed or missed its deadline. The local sources are started right
+    away, a remote source only once every remote source with a higher
+    priority has failed or missed its deadline, so the SQL server is not
+    queried while the live feeds answer. The deadline of a source counts
+    from its start.
+
+    Returns a tuple (data, report), where data is the usual
+    (cases_df, high_risk_df, stats_df, hospital_awaiting_df) tuple (stats_df
+    is None unless read from a snapshot, the Snapshot derives it) and report
+    is a dictionary recording the winning source, and the status and time
+    taken by every source. Sources still running when the answer is chosen,
+    or never started, have a timing of None; the report is not changed by
+    the ones finishing later.
 
+    """
+    if sources is None:
+        sources = SOURCE_PRIORITY if live else SOURCE_PRIORITY[1:]
+    sources = [name for name in SOURCE_PRIORITY if name in sources]
+
+    report = {'source': None, 'status': {}, 'timings': {}}
+    # Written by the loader threads, the report only gets a copy
+    timings = {}
+    started = {}
+
+    def run(name):
+        try:
+            return enrich_data(*SOURCE_LOADERS[name]())
+        finally:
+            timings[name] = time.perf_counter() - started[name]
+
+    # Threads cannot be cancelled, so we do not wait for the ones that missed their deadline
+    executor = ThreadPoolExecutor(max_workers=len(sources), thread_name_prefix='load-data')
+    futures = {}
+
+    def start(name):
+        if name not in futures:
+            started[name] = time.perf_counter()
+            futures[name] = executor.submit(run, name)
+
+    for name in sources:
+        if name not in REMOTE_SOURCES:
+            start(name)
+
+    while True:
+        waiting_for = None
+        for name in sources:
+            start(name)
+            future = futures[name]
+            deadline = deadlines.get(name)
+            if future.done():
+                if future.exception() is None:
+                    report['source'] = name
+                    report['status'][name] = 'ok'
+                    break
+                if name not in report['status']:
+                    report['status'][name] = 'failed'
+                    print(f'Loading data from {name} failed: {future.exception()}')
+            elif deadline is not None and time.perf_counter() - started[name] >= deadline:
+                report['status'][name] = 'timeout'
+            else:
+                waiting_for = name
+                break
+
+        if report['source'] is not None:
+            break
+        if waiting_for is None:
+            executor.shutdown(wait=False)
+            raise RuntimeError(f'Unable to load data from any of the sources {sources}')
+
+        deadline = deadlines.get(waiting_for)
+        timeout = None if deadline is None else max(deadline - (time.perf_counter() - started[waiting_for]), 0)
+        wait([futures[waiting_for]], timeout=timeout, return_when=FIRST_COMPLETED)
+    executor.shutdown(wait=False)
+
+    for name in sources:
+        if name not in report['status']:
+            if name not in futures:
+                report['status'][name] = 'not started'
+            elif futures[name].done() and futures[name].exception() is None:
+                report['status'][name] = 'ok'
+            else:
+                report['status'][name] = 'abandoned'
+        report['timings'][name] = timings.get(name)
+
+    print(f'Loaded data from {report["source"]} in {report["timings"][report["source"]]:.2f}s')
+    return futures[report['source']].result(), report
+
+def load_data(live=False):
+    data, report = load_data_with_report(live=live)
+    return data
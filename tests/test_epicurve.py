@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the incremental epidemic curve, against counting from scratch.
+
+Usage:
+    python -m pytest tests
+"""
+
+import os
+import sys
+
+import pandas as pd
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+sys.path.insert(0, os.path.join(dir_path, '..', 'src'))
+from epicurve import EpidemicCurve, DIMENSIONS
+
+STATUSES = ['Hospitalised', 'Discharged', 'Deceased']
+CLASSIFICATIONS = ['Imported case', 'Local case']
+
+
+def make_cases(n=50):
+    return pd.DataFrame({
+        'case_no': list(range(1, n + 1)),
+        # Two cases a day
+        'confirmation_date': [pd.Timestamp('2020-02-01') + pd.Timedelta(days=i // 2) for i in range(n)],
+        'status_en': [STATUSES[i % len(STATUSES)] for i in range(n)],
+        'classification_en': [CLASSIFICATIONS[i % len(CLASSIFICATIONS)] for i in range(n)],
+    })
+
+
+def seeded_series(cases_df):
+    curve = EpidemicCurve()
+    curve.update(cases_df, 1)
+    return curve.series()
+
+
+def assert_same_series(series, expected):
+    for dim in DIMENSIONS:
+        daily = series['daily'][dim]
+        # A value no longer present is kept as a column of zeros by the incremental update
+        daily = daily.loc[:, (daily != 0).any()]
+        pd.testing.assert_frame_equal(
+            daily.sort_index(axis=1), expected['daily'][dim].sort_index(axis=1),
+            check_freq=False, check_names=False
+        )
+    pd.testing.assert_frame_equal(series['total'], expected['total'], check_freq=False, check_dtype=False)
+
+
+def test_incremental_update_equals_seeding():
+    cases_df = make_cases()
+    curve = EpidemicCurve()
+    curve.update(cases_df, 1)
+
+    # Five changes out of 51 cases, under REBUILD_FRACTION, so they are applied case by case
+    updated = cases_df.copy()
+    # Changed status and date
+    updated.loc[updated['case_no'] == 10, 'status_en'] = 'Deceased'
+    updated.loc[updated['case_no'] == 20, 'confirmation_date'] = pd.Timestamp('2020-02-25')
+    # Removed
+    updated = updated[updated['case_no'] != 30]
+    # Added, one of them before the current first day
+    added = pd.DataFrame({
+        'case_no': [51, 52],
+        'confirmation_date': [pd.Timestamp('2020-02-12'), pd.Timestamp('2020-01-28')],
+        'status_en': ['Hospitalised', 'Critical'],
+        'classification_en': ['Local case', 'Imported case'],
+    })
+    updated = pd.concat([updated, added], ignore_index=True)
+
+    affected = curve.update(updated, 2)
+
+    assert pd.Timestamp('2020-01-28') in affected
+    assert curve.version == 2
+    assert_same_series(curve.series(), seeded_series(updated))
+
+
+def test_advance_ignores_older_versions():
+    cases_df = make_cases()
+    curve = EpidemicCurve()
+    assert curve.advance(cases_df, 2) is not None
+    assert curve.advance(cases_df.iloc[:10], 1) is None
+    assert_same_series(curve.series(), seeded_series(cases_df))
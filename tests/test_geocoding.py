@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+Offline tests of the geocoding service, with StubGeocoder instead of Nominatim.
+
+Usage:
+    python -m pytest tests
+"""
+
+import os
+import sys
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+sys.path.insert(0, os.path.join(dir_path, '..', 'src'))
+from geocoding import GeocodingService, StubGeocoder, NEGATIVE_TTL_SECONDS
+
+
+class FakeClock(object):
+    """Clock and sleep of the service, so the rate limit is checked without waiting
+
+    """
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class FailingGeocoder(object):
+    def __init__(self):
+        self.queries = []
+
+    def geocode(self, query):
+        self.queries.append(query)
+        raise OSError('connection refused')
+
+
+def make_service(geocoder, clock=None):
+    clock = clock or FakeClock()
+    return GeocodingService(geocoder, cache_path=None, sleep=clock.sleep, clock=clock)
+
+
+def test_resolve_uses_the_cache():
+    geocoder = StubGeocoder({'Pacific Place, Admiralty, Hong Kong': (22.2775, 114.1650)})
+    service = make_service(geocoder)
+
+    assert service.resolve('Pacific Place, Admiralty') == (22.2775, 114.1650)
+    assert service.resolve('  pacific place,  admiralty ') == (22.2775, 114.1650)
+    assert len(geocoder.queries) == 1
+
+
+def test_not_found_is_cached_until_the_ttl():
+    clock = FakeClock()
+    geocoder = StubGeocoder({})
+    service = make_service(geocoder, clock)
+
+    assert service.resolve('Nowhere') == (None, None)
+    queries = len(geocoder.queries)
+    assert service.resolve('Nowhere') == (None, None)
+    assert len(geocoder.queries) == queries
+
+    clock.now += NEGATIVE_TTL_SECONDS + 1
+    service.resolve('Nowhere')
+    assert len(geocoder.queries) > queries
+
+
+def test_errors_are_not_cached():
+    service = make_service(FailingGeocoder())
+
+    assert service.resolve('Pacific Place, Admiralty') == (None, None)
+    assert len(service.geocoder.queries) == service.max_retries
+    assert service.cache == {}
+
+    # Once the geocoder answers again, the address is resolved
+    service.geocoder = StubGeocoder({'Pacific Place, Admiralty, Hong Kong': (22.2775, 114.1650)})
+    assert service.resolve('Pacific Place, Admiralty') == (22.2775, 114.1650)
+
+
+def test_requests_are_rate_limited():
+    clock = FakeClock()
+    geocoder = StubGeocoder({'A, Hong Kong': (22.1, 114.1), 'B, Hong Kong': (22.2, 114.2)})
+    service = make_service(geocoder, clock)
+
+    results = service.resolve_many(['A', 'B', 'A'])
+
+    assert results == {'A': (22.1, 114.1), 'B': (22.2, 114.2)}
+    assert geocoder.queries == ['A, Hong Kong', 'B, Hong Kong']
+    assert clock.sleeps == [service.min_delay]
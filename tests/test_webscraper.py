@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+Offline tests of the feed merge and of the conditional requests, with a stub session instead of wars.vote4.hk.
+
+Usage:
+    python -m pytest tests
+"""
+
+import os
+import sys
+import json
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+sys.path.insert(0, os.path.join(dir_path, '..', 'src'))
+import pytest
+import webscraper
+from webscraper import merge_nodes, fetch_cases, CASES_URL
+
+TEST_URL = 'https://example.invalid/page-data.json'
+COLUMNS = ['case_no', 'status_en']
+
+
+class FeedResponse(object):
+    def __init__(self, status_code, content=b'', headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise OSError(f'HTTP {self.status_code}')
+
+
+class FeedSession(object):
+    """Serves the given responses in order, and records the headers of every request
+
+    """
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def get(self, url, headers=None, timeout=None):
+        self.requests.append(dict(headers or {}))
+        return self.responses.pop(0)
+
+
+def encode_cases(*cases):
+    edges = [{'node': {'case_no': case_no, 'status_en': status}} for case_no, status in cases]
+    return json.dumps({'result': {'data': {'allWarsCase': {'edges': edges}}}}).encode('utf-8')
+
+
+@pytest.fixture(autouse=True)
+def clear_feed_cache():
+    webscraper._feed_cache.clear()
+    yield
+    webscraper._feed_cache.clear()
+
+
+def merge(nodes, built):
+    def build_df(buffers):
+        built.append(list(buffers['case_no']))
+        return webscraper._build_cases_df(buffers)
+    df = merge_nodes(TEST_URL, iter(nodes), 'case_no', COLUMNS, {}, build_df)
+    return dict(zip(df['case_no'], df['status_en']))
+
+
+def test_merge_nodes_only_builds_new_and_changed_rows():
+    built = []
+    first = [{'case_no': 1, 'status_en': 'Hospitalised'}, {'case_no': 2, 'status_en': 'Hospitalised'},
+             {'case_no': 3, 'status_en': 'Hospitalised'}]
+    assert merge(first, built) == {1: 'Hospitalised', 2: 'Hospitalised', 3: 'Hospitalised'}
+
+    # 1 unchanged, 2 changed, 3 removed, 4 new
+    second = [{'case_no': 1, 'status_en': 'Hospitalised'}, {'case_no': 2, 'status_en': 'Discharged'},
+              {'case_no': 4, 'status_en': 'Hospitalised'}]
+    assert merge(second, built) == {1: 'Hospitalised', 2: 'Discharged', 4: 'Hospitalised'}
+    assert built == [[1, 2, 3], [2, 4]]
+
+    # Nothing changed: the previous rows are reused without building any
+    assert merge(second, built) == {1: 'Hospitalised', 2: 'Discharged', 4: 'Hospitalised'}
+    assert len(built) == 2
+
+
+def test_validators_are_stored_once_the_body_was_parsed():
+    session = FeedSession(
+        FeedResponse(200, b'{"result": {"data": {"allWarsCase": {"edges": [{"node": ', {'ETag': '"truncated"'}),
+        FeedResponse(200, encode_cases((1, 'Hospitalised')), {'ETag': '"v1"'}),
+        FeedResponse(304),
+    )
+
+    # A body that fails to parse leaves no validators behind
+    with pytest.raises(Exception):
+        fetch_cases(session)
+    assert 'etag' not in webscraper._feed_cache[CASES_URL]
+
+    # So the next request is unconditional, and its validators are kept once the DataFrame is built
+    cases_df = fetch_cases(session)
+    assert session.requests[1] == {}
+    assert list(cases_df['case_no']) == [1]
+    assert webscraper._feed_cache[CASES_URL]['etag'] == '"v1"'
+
+    # An unchanged feed answers 304, and the previous DataFrame is returned
+    assert fetch_cases(session) is cases_df
+    assert session.requests[2] == {'If-None-Match': '"v1"'}
+
+
+def test_same_body_is_not_parsed_again():
+    content = encode_cases((1, 'Hospitalised'), (2, 'Discharged'))
+    session = FeedSession(FeedResponse(200, content), FeedResponse(200, content))
+
+    cases_df = fetch_cases(session)
+    # The server ignores the validators: the body hash tells the feed is unchanged
+    assert fetch_cases(session) is cases_df